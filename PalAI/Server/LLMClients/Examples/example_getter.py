@@ -1,62 +1,145 @@
-
 import json
 import os
+import time
 
-def getArchitectExamples(prompt):
+from PalAI.Server.LLMClients.Examples.example_selector import ExampleIndex
 
-    with open(os.path.join(os.path.dirname(__file__), 'prompt_examples.json'), 'r', encoding='utf-8') as f:
-        # returns JSON object as
-        # a dictionary
-        jsondata = json.load(f)
-        messages = []
-        for data in jsondata["architect_examples"]:
-            messages.append({"role": "user", "content": jsondata["architect_examples"][data]["user"]})
-            messages.append({"role": "assistant", "content": jsondata["architect_examples"][data]["assistant"]})
+EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), 'prompt_examples.json')
 
-        messages.append({"role": "user", "content": prompt})
-        return messages
 
-def getBrickExamples(prompt):
-    # Opening JSON file
+class ExampleStore:
+    AGENT_EXAMPLES = ("architect_examples", "bricklayer_examples", "addons_examples")
 
-    with open(os.path.join(os.path.dirname(__file__), 'prompt_examples.json'), 'r', encoding='utf-8') as f:
-        # returns JSON object as
-        # a dictionary
-        jsondata = json.load(f)
-        messages = []
-        for data in jsondata["bricklayer_examples"]:
-            messages.append({"role": "user", "content": jsondata["bricklayer_examples"][data]["user"]})
-            messages.append({"role": "assistant", "content": jsondata["bricklayer_examples"][data]["assistant"]})
+    def __init__(self, path=EXAMPLES_PATH, check_interval=1.0, top_k=6, token_budget=1500):
+        """Few-shot examples of every agent, loaded once and reloaded when the file changes
 
-        messages.append({"role": "user", "content": prompt})
-        return messages
+        :param path: path to the examples json
+        :type path: str
+        :param check_interval: minimum seconds between checks for changes to the file
+        :type check_interval: float
+        :param top_k: maximum number of examples selected for a prompt
+        :type top_k: int
+        :param token_budget: maximum number of tokens of the examples selected for a prompt
+        :type token_budget: int
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self._mtime = None
+        self._last_check = None
+        self._prefixes = {}
+        self._indexes = {}
 
+    def _load(self, mtime):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            jsondata = json.load(f)
 
-def getMaterialExamples(prompt):
-    with open(os.path.join(os.path.dirname(__file__), 'prompt_examples.json'), 'r', encoding='utf-8') as f:
-        # returns JSON object as
-        # a dictionary
-        #jsondata = json.load(f)
-        messages = []
-        #for data in jsondata["house_design_examples"]:
-        #    messages.append({"role": "user", "content": jsondata["house_design_examples"][data]["user"]})
-        #    messages.append({"role": "assistant", "content": jsondata["house_design_examples"][data]["assistant"]})
+        prefixes, indexes = {}, {}
+        for key in ExampleStore.AGENT_EXAMPLES:
+            examples = list(jsondata.get(key, {}).values())
+            prefixes[key] = _to_messages(examples)
+            indexes[key] = ExampleIndex(examples)
 
+        self._prefixes = prefixes
+        self._indexes = indexes
+        self._mtime = mtime
+
+    def _check_file(self):
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        mtime = os.stat(self.path).st_mtime
+        if mtime != self._mtime:
+            self._load(mtime)
+
+    def get_prefix(self, key):
+        """Returns the examples of an agent as alternating user and assistant messages
+        The messages are shared between requests and must not be modified
+
+        :param key: examples key in the json, such as 'architect_examples'
+        :type key: str
+        :rtype: tuple(dict)
+        """
+        self._check_file()
+        return self._prefixes[key]
+
+    def get_index(self, key):
+        """Returns the similarity index of an agent's examples
+
+        :rtype: ExampleIndex
+        """
+        self._check_file()
+        return self._indexes[key]
+
+    def get_messages(self, key, prompt, select=False):
+        """Returns the examples of an agent followed by the user prompt
+
+        :param select: only include the examples most similar to the prompt, within top_k and token_budget
+        :type select: bool
+        :rtype: list(dict)
+        """
+        if select:
+            examples = self.get_index(key).select(prompt, self.top_k, self.token_budget)
+            messages = list(_to_messages(examples))
+        else:
+            messages = list(self.get_prefix(key))
         messages.append({"role": "user", "content": prompt})
         return messages
 
 
+def _to_messages(examples):
+    messages = []
+    for data in examples:
+        messages.append({"role": "user", "content": data["user"]})
+        messages.append({"role": "assistant", "content": data["assistant"]})
+    return tuple(messages)
 
-def getAddOnsExamples(prompt):
-    with open(os.path.join(os.path.dirname(__file__), 'prompt_examples.json'), 'r', encoding='utf-8') as f:
-        # returns JSON object as
-        # a dictionary
+
+def add_example(key, user, assistant, path=EXAMPLES_PATH):
+    """Adds an example to the examples json, stores pick it up the next time they check the file
+
+    :param key: examples key in the json, such as 'architect_examples'
+    :type key: str
+    :param user: user prompt
+    :type user: str
+    :param assistant: expected response
+    :type assistant: str
+    """
+    with open(path, 'r', encoding='utf-8') as f:
         jsondata = json.load(f)
-        messages = []
-        for data in jsondata["addons_examples"]:
-            messages.append({"role": "user", "content": jsondata["addons_examples"][data]["user"]})
-            messages.append({"role": "assistant", "content": jsondata["addons_examples"][data]["assistant"]})
 
-        prompt = prompt.replace("B:", "\nB:")
-        messages.append({"role": "user", "content": prompt})
-        return messages
+    examples = jsondata.setdefault(key, {})
+    i = len(examples) + 1
+    while f"Example{i}" in examples:
+        i += 1
+    examples[f"Example{i}"] = {"user": user, "assistant": assistant}
+
+    # Replace the file at once so readers never see it half written
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(jsondata, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+_store = ExampleStore()
+
+
+def getArchitectExamples(prompt):
+    return _store.get_messages("architect_examples", prompt, select=True)
+
+
+def getBrickExamples(prompt):
+    return _store.get_messages("bricklayer_examples", prompt)
+
+
+def getMaterialExamples(prompt):
+    # The artist doesn't use examples
+    return [{"role": "user", "content": prompt}]
+
+
+def getAddOnsExamples(prompt):
+    prompt = prompt.replace("B:", "\nB:")
+    return _store.get_messages("addons_examples", prompt, select=True)
@@ -0,0 +1,100 @@
+import re
+import zlib
+
+import numpy as np
+
+from PalAI.Server.LLMClients.token_accounting import count_tokens
+
+
+def _features(text: str) -> list[str]:
+    # Words and word pairs capture layer names, character trigrams capture typos and plurals
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f" {w} "
+        features.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+class ExampleIndex:
+    def __init__(self, examples: list[dict], dimensions=4096):
+        """In-process index of few-shot examples, embedded with hashed n-gram TF-IDF vectors
+        Everything is computed locally, no model or network access is needed
+
+        :param examples: examples with 'user' and 'assistant' keys
+        :type examples: list(dict)
+        :param dimensions: size of the hashed feature space
+        :type dimensions: int
+        """
+        self.dimensions = dimensions
+        self.examples = []
+        self._counts = np.zeros((0, dimensions))
+        self._tokens = np.zeros(0, dtype=int)
+        self.extend(examples)
+
+    def _hash(self, text: str) -> np.ndarray:
+        counts = np.zeros(self.dimensions)
+        for f in _features(text):
+            counts[zlib.crc32(f.encode()) % self.dimensions] += 1
+        return counts
+
+    def extend(self, examples: list[dict]):
+        """Adds examples to the index"""
+        examples = list(examples)
+        if len(examples) == 0:
+            return
+        self.examples.extend(examples)
+        self._counts = np.vstack([self._counts] + [self._hash(e["user"]) for e in examples])
+        self._tokens = np.append(
+            self._tokens,
+            [count_tokens(e["user"]) + count_tokens(e["assistant"]) for e in examples],
+        )
+
+        document_frequency = (self._counts > 0).sum(axis=0)
+        self._idf = np.log((1 + len(self.examples)) / (1 + document_frequency)) + 1
+        self._vectors = self._normalize(self._counts * self._idf)
+
+    def add(self, user: str, assistant: str):
+        self.extend([{"user": user, "assistant": assistant}])
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def similarities(self, prompt: str) -> np.ndarray:
+        """Cosine similarity between the prompt and every example"""
+        if len(self.examples) == 0:
+            return np.zeros(0)
+        query = self._normalize(self._hash(prompt) * self._idf)
+        return self._vectors @ query
+
+    def select(self, prompt: str, top_k=6, token_budget=1500) -> list[dict]:
+        """Selects the examples most similar to the prompt
+
+        :param prompt: incoming user prompt
+        :type prompt: str
+        :param top_k: maximum number of examples
+        :type top_k: int
+        :param token_budget: maximum number of tokens, summed over the selected examples
+        :type token_budget: int
+        :return: selected examples, in the order they were added to the index
+        :rtype: list(dict)
+        """
+        similarities = self.similarities(prompt)
+        # Stable sort, ties keep the order of the file
+        ranking = np.argsort(-similarities, kind="stable")
+
+        selected, tokens = [], 0
+        for i in ranking.tolist():
+            if len(selected) >= top_k:
+                break
+            if tokens + self._tokens[i] > token_budget:
+                continue
+            selected.append(i)
+            tokens += self._tokens[i]
+
+        return [self.examples[i] for i in sorted(selected)]
+
+    def __len__(self):
+        return len(self.examples)
@@ -1,9 +1,12 @@
+import asyncio
+from contextlib import aclosing
+
 import colorama
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from loguru import logger
 
+from PalAI.Server.LLMClients import llm_pool
 from PalAI.Server.LLMClients.llm_client import LLMClient
 
 
@@ -15,14 +18,17 @@ class GPTClient(LLMClient):
         self.api_key = self.config.get("openai", "api_key")
         self.model_name = self.config.get("openai", "model_name")
         self.verbose = kwargs.get("verbose", False)
-
-        if self.api_key is not None:
-            self.llm = ChatOpenAI(
-                model=self.model_name,
-                temperature=self.temperature,
-                api_key=self.api_key,
-                max_tokens=self.max_tokens,
-            )
+        # Few-shot examples have never been sent to the model, sending them makes every prompt larger
+        self.send_examples = self.config.getboolean("openai", "send_examples", fallback=False)
+
+        # Models, chains and connections are shared by every client in the worker
+        self.pool = llm_pool.get_pool(
+            max_in_flight=self.config.getint("openai", "max_in_flight", fallback=32),
+            max_connections=self.config.getint("openai", "max_connections", fallback=64),
+            max_keepalive_connections=self.config.getint(
+                "openai", "max_keepalive_connections", fallback=32
+            ),
+        )
         self.price_rate = 0.0000005
 
         if "gpt4" in self.model_name:
@@ -36,37 +42,53 @@ class GPTClient(LLMClient):
         elif "gpt-4" in self.model_name:
             self.price_rate = 0.00003
 
-        self.llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=self.temperature,
-            api_key=self.api_key,
-            max_tokens=self.max_tokens,
+    @property
+    def llm(self):
+        return self.pool.get_model(
+            self.model_name, self.temperature, self.max_tokens, self.api_key
         )
 
-    async def get_llm_response(self, system_message, prompt, image_path="", **kwargs):
+    def _get_chain(self, system_message, prompt, agent=None, messages=None):
+        """Returns the chain of an agent and its inputs
+
+        :param messages: messages from preparePrompt, the selected examples followed by the user prompt,
+            the examples are only sent if send_examples is enabled
+        :type messages: list(dict)
+        :return: chain and its inputs
+        :rtype: tuple
+        """
+        # The last message is the user prompt, which the chain adds itself
+        examples = []
+        if self.send_examples:
+            examples = [(m["role"], m["content"]) for m in (messages or [])[:-1]]
         if self.verbose:
             logger.info(
                 f"{colorama.Fore.GREEN}System message:{colorama.Fore.RESET} {system_message}"
             )
             logger.info(f"{colorama.Fore.BLUE}Prompt:{colorama.Fore.RESET} {prompt}")
 
-        self.prompt_total += system_message + prompt
-
-        chat_prompt = ChatPromptTemplate.from_messages(
-            [("system", "{system_message}"), ("user", f"{prompt}")]
+        chain = self.pool.get_chain(
+            agent, self.model_name, self.temperature, self.max_tokens, self.api_key
         )
+        return chain, {
+            "system_message": system_message,
+            "examples": examples,
+            "prompt": prompt,
+        }
 
-        llm = self.llm
-        chain = chat_prompt | llm | StrOutputParser()
+    async def get_llm_response(self, system_message, prompt, image_path="", **kwargs):
+        chain, inputs = self._get_chain(
+            system_message, prompt, kwargs.get("agent"), kwargs.get("messages")
+        )
 
         # Invoke the chain asynchronously
         try:
-            response = await chain.ainvoke(
-                {"system_message": system_message, "prompt": chat_prompt}
-            )
+            async with self.pool.slot():
+                response = await chain.ainvoke(inputs)
         except Exception as e:
             logger.error(f"Error during chain invocation: {e}")
             raise
+        self.record_usage(kwargs.get("agent"), _prompt_text(inputs), response)
 
         if self.verbose:
             logger.info(
@@ -75,6 +97,59 @@ class GPTClient(LLMClient):
 
         return response
 
+    async def stream_agent_response(self, agent, prompt, **kwargs):
+        system_message = self._get_agent_system_message(agent, **kwargs)
+        cache_key = self._get_cache_key(agent, system_message, prompt)
+        if cache_key is not None:
+            response = await asyncio.to_thread(
+                self.response_cache.get, cache_key, agent
+            )
+            if response is not None:
+                yield response
+                return
+
+        kwargs["messages"] = self.preparePrompt(prompt, agent=agent)
+        kwargs["agent"] = agent
+        response = ""
+        # Closing the stream as soon as this generator is closed releases the pool slot
+        async with aclosing(
+            self.stream_llm_response(system_message, prompt, **kwargs)
+        ) as stream:
+            async for chunk in stream:
+                response += chunk
+                yield chunk
+
+        if cache_key is not None:
+            await asyncio.to_thread(self.response_cache.set, cache_key, response)
+
+    async def stream_llm_response(self, system_message, prompt, **kwargs):
+        """Same as get_llm_response, but yields the response as tokens arrive
+
+        :return: chunks of the response
+        :rtype: AsyncIterator(str)
+        """
+        chain, inputs = self._get_chain(
+            system_message, prompt, kwargs.get("agent"), kwargs.get("messages")
+        )
+
+        response = ""
+        try:
+            # The slot is held while the response is generated, consumers that stop early
+            # must close this generator (e.g. with contextlib.aclosing) to release it
+            async with self.pool.slot(), aclosing(chain.astream(inputs)) as stream:
+                async for chunk in stream:
+                    response += chunk
+                    yield chunk
+        except Exception as e:
+            logger.error(f"Error during chain streaming: {e}")
+            raise
+        self.record_usage(kwargs.get("agent"), _prompt_text(inputs), response)
+
+        if self.verbose:
+            logger.info(
+                f"{colorama.Fore.CYAN} Response:{colorama.Fore.RESET} {response}"
+            )
+
     async def get_llm_single_response(
         self, context_type, context_file, original_prompt, debug=False
     ):
@@ -89,15 +164,10 @@ class GPTClient(LLMClient):
 
         messages = []
         messages.append(("system", system_message))
-        self.prompt_total += system_message
 
         for i, user_prompt in enumerate(user):
             messages.append(("user", user_prompt))
             messages.append(("assistant", assistant[i]))
-            self.prompt_total += user_prompt
-            self.prompt_total += assistant[i]
-
-        self.prompt_total += original_prompt
 
         prompt = ChatPromptTemplate.from_messages(messages)
         llm = self.llm
@@ -110,6 +180,11 @@ class GPTClient(LLMClient):
                 "prompt": original_prompt,
             }
         )
+        self.record_usage(
+            context_type,
+            "".join(content for _, content in messages) + original_prompt,
+            response,
+        )
 
         if self.verbose:
             logger.info(
@@ -117,3 +192,12 @@ class GPTClient(LLMClient):
             )
 
         return response
+
+
+def _prompt_text(inputs) -> str:
+    """Everything sent to the LLM as text, used to count the prompt tokens"""
+    return (
+        inputs["system_message"]
+        + "".join(content for _, content in inputs["examples"])
+        + inputs["prompt"]
+    )
@@ -1,8 +1,11 @@
+import asyncio
 from abc import abstractmethod
-import os
-from configparser import RawConfigParser
+import sentry_sdk
 from loguru import logger
 from PalAI.Server.LLMClients.Examples import example_getter
+from PalAI.Server.LLMClients.response_cache import get_response_cache
+from PalAI.Server.LLMClients.token_accounting import TokenAccounting, count_tokens
+from PalAI.Server.settings import get_settings
 
 
 class LLMClient:
@@ -20,17 +23,24 @@ class LLMClient:
         self.prompts_file = prompts_file
         self.system_prompt = self.prompts_file.get("system_prompt", "")
         self.prompt_template = self.prompts_file.get("prompt_template", "")
-        self.prompt_total = ""
         self.price_rate = 0.00000015
-        os.chdir(os.path.dirname(__file__))
 
-
-        config_path = os.getenv("CONFIG_PATH", "config.ini")
-        self.config = RawConfigParser()
-        self.config.read("../../../" + config_path)
+        self.config = get_settings()
         self.temperature = float(self.config.get("llm", "temperature"))
         self.max_tokens = int(self.config.get("llm", "max_tokens"))
         self.verbose = bool(self.config.get("llm", "verbose"))
+        self.usage = TokenAccounting(
+            self.config.getint("llm", "usage_history", fallback=256)
+        )
+
+        self.response_cache = None
+        if self.config.getboolean("cache", "enabled", fallback=False):
+            self.response_cache = get_response_cache(
+                self.config.getpath("cache", "path", fallback="llm_cache.sqlite"),
+                self.config.getfloat("cache", "ttl", fallback=86400.0),
+                self.config.getint("cache", "max_entries", fallback=10000),
+                self.config.getint("cache", "evict_interval", fallback=64),
+            )
 
     @abstractmethod
     async def get_llm_response(self, system_message, prompt, image_path="", **kwargs):
@@ -64,11 +74,40 @@ class LLMClient:
                 system_message = self.prompts_file[LLMClient.ARCHITECT]
         return system_message
 
+    def _get_cache_key(self, agent, system_message, prompt):
+        if self.response_cache is None:
+            return None
+        return self.response_cache.make_key(
+            agent, system_message, prompt, getattr(self, "model_name", "")
+        )
+
     async def get_agent_response(self, agent, prompt, **kwargs):
         system_message = self._get_agent_system_message(agent, **kwargs)
+        cache_key = self._get_cache_key(agent, system_message, prompt)
+        if cache_key is not None:
+            response = await asyncio.to_thread(
+                self.response_cache.get, cache_key, agent
+            )
+            if response is not None:
+                return response
+
         messages = self.preparePrompt(prompt, agent=agent)
         kwargs["messages"] = messages
-        return await self.get_llm_response(system_message, prompt, **kwargs)
+        kwargs["agent"] = agent
+        response = await self.get_llm_response(system_message, prompt, **kwargs)
+
+        if cache_key is not None:
+            await asyncio.to_thread(self.response_cache.set, cache_key, response)
+        return response
+
+    async def stream_agent_response(self, agent, prompt, **kwargs):
+        """Streams the response of an agent as it is generated
+        Clients that can't stream yield the complete response at once
+
+        :return: chunks of the response
+        :rtype: AsyncIterator(str)
+        """
+        yield await self.get_agent_response(agent, prompt, **kwargs)
 
     def preparePrompt(self, prompt, agent='architect'):
 
@@ -94,8 +133,32 @@ class LLMClient:
 
         return messages
 
-    def getTotalPromptsUsed(self):
-        return self.prompt_total
+    def record_usage(self, agent, prompt, response):
+        """Counts the tokens sent to and received from the LLM
+
+        :param prompt: everything sent to the LLM, system message included
+        :type prompt: str
+        :param response: text generated by the LLM
+        :type response: str
+        :rtype: RequestUsage
+        """
+        usage = self.usage.record(
+            agent,
+            getattr(self, "model_name", ""),
+            count_tokens(prompt),
+            count_tokens(response),
+            self.price_rate,
+        )
+        sentry_sdk.metrics.distribution(
+            key="LLM Tokens",
+            value=usage.prompt_tokens + usage.completion_tokens,
+            unit="count",
+            tags={"agent": usage.agent, "service": "PALAI"},
+        )
+        return usage
+
+    def getTotalTokensUsed(self):
+        return self.usage.totals()["prompt_tokens"]
 
     # When it is necessary to treat the prompt more carefully. When systems need user -> assistant type of queries
 
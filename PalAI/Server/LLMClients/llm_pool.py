@@ -0,0 +1,141 @@
+import asyncio
+import functools
+import os
+from contextlib import asynccontextmanager
+
+import httpx
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_openai import ChatOpenAI
+
+
+class LLMPool:
+    def __init__(
+        self,
+        max_in_flight=32,
+        max_connections=64,
+        max_keepalive_connections=32,
+        keepalive_expiry=30.0,
+    ):
+        """Process wide pool of chat models and chains, shared by every websocket session in a worker
+        All models send their requests through one keep-alive HTTP connection pool
+
+        :param max_in_flight: maximum number of concurrent LLM requests, the rest wait in a queue
+        :type max_in_flight: int
+        :param max_connections: maximum number of open connections to the provider
+        :type max_connections: int
+        :param max_keepalive_connections: maximum number of idle connections kept alive
+        :type max_keepalive_connections: int
+        :param keepalive_expiry: seconds an idle connection is kept alive
+        :type keepalive_expiry: float
+        """
+        self.max_in_flight = max_in_flight
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.in_flight = 0
+        self.queued = 0
+        self._reset()
+
+    def _reset(self):
+        # Connections and semaphores can't be shared with the parent process,
+        # with gunicorn --preload everything is created lazily in each worker
+        self._pid = os.getpid()
+        self._loop = None
+        self._http_client = None
+        self._models = {}
+        self._chains = {}
+        self._semaphore = None
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+        # The connections, and the models and semaphore using them, belong to the event loop
+        # they were first used in. Tools that call asyncio.run more than once get new ones
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop:
+            if self._loop is not None:
+                self._reset()
+            self._loop = loop
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        self._check_process()
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(limits=self.limits, timeout=60.0)
+        return self._http_client
+
+    def get_model(self, model_name, temperature, max_tokens, api_key) -> ChatOpenAI:
+        """Returns the chat model for the given settings, created once per worker"""
+        self._check_process()
+        key = (model_name, temperature, max_tokens, api_key)
+        if key not in self._models:
+            self._models[key] = ChatOpenAI(
+                model=model_name,
+                temperature=temperature,
+                api_key=api_key,
+                max_tokens=max_tokens,
+                http_async_client=self.get_http_client(),
+            )
+        return self._models[key]
+
+    def get_chain(self, agent, model_name, temperature, max_tokens, api_key):
+        """Returns the compiled prompt | llm | parser chain of an agent, created once per worker
+
+        The chain expects the inputs 'system_message' and 'prompt', and optionally the few-shot 'examples'
+        sent between them as (role, content) messages
+        """
+        self._check_process()
+        key = (agent, model_name, temperature, max_tokens, api_key)
+        if key not in self._chains:
+            chat_prompt = ChatPromptTemplate.from_messages(
+                [
+                    ("system", "{system_message}"),
+                    MessagesPlaceholder("examples", optional=True),
+                    ("user", "{prompt}"),
+                ]
+            )
+            llm = self.get_model(model_name, temperature, max_tokens, api_key)
+            self._chains[key] = chat_prompt | llm | StrOutputParser()
+        return self._chains[key]
+
+    @asynccontextmanager
+    async def slot(self):
+        """Waits until fewer than max_in_flight requests are running"""
+        self._check_process()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "models": len(self._models),
+            "chains": len(self._chains),
+        }
+
+
+@functools.cache
+def get_pool(
+    max_in_flight=32, max_connections=64, max_keepalive_connections=32
+) -> LLMPool:
+    """Returns the pool shared by every client in the process"""
+    return LLMPool(max_in_flight, max_connections, max_keepalive_connections)
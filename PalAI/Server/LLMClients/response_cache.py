@@ -0,0 +1,140 @@
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import sentry_sdk
+
+
+class ResponseCache:
+    def __init__(self, path, ttl=86400.0, max_entries=10000, evict_interval=64):
+        """Persistent cache of LLM agent responses, stored in SQLite so every worker shares it
+        Only the raw LLM text is cached, the rest of the pipeline still uses each request's rng
+
+        :param path: path to the SQLite database, created if it doesn't exist
+        :type path: str
+        :param ttl: seconds a response stays valid
+        :type ttl: float
+        :param max_entries: maximum number of stored responses, the least recently used are evicted
+        :type max_entries: int
+        :param evict_interval: writes between evictions, the cache can exceed max_entries until the next one
+        :type evict_interval: int
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._pid = None
+        self._writes = 0
+        # Calls run in worker threads so they don't block the event loop, they share one connection
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # SQLite connections can't be shared with forked workers
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(
+                self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+            )
+            self._pid = os.getpid()
+            self._writes = 0
+        return self._connection
+
+    @staticmethod
+    def make_key(agent, system_message, prompt, model_name) -> str:
+        """Creates the key of a request, prompts that only differ in case or whitespace share a key
+
+        :rtype: str
+        """
+        normalized_prompt = " ".join(prompt.lower().split())
+        system_hash = hashlib.sha256(system_message.encode()).hexdigest()
+        key = "\n".join((agent, system_hash, normalized_prompt, model_name or ""))
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key, agent=""):
+        """Returns the cached response, None if it is missing or expired
+        Blocks while other workers write, call it with asyncio.to_thread from async code
+
+        :rtype: str
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+                )
+
+        if row is None:
+            self.misses += 1
+            sentry_sdk.metrics.incr(
+                key="LLM Cache Miss", value=1, tags={"agent": agent, "service": "PALAI"}
+            )
+            return None
+
+        self.hits += 1
+        sentry_sdk.metrics.incr(
+            key="LLM Cache Hit", value=1, tags={"agent": agent, "service": "PALAI"}
+        )
+        return row[0]
+
+    def set(self, key, response):
+        """Stores a response, expired and least recently used responses are evicted every evict_interval writes
+        Blocks while other workers write, call it with asyncio.to_thread from async code
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._writes += 1
+            if self._writes % self.evict_interval == 0:
+                self._evict(connection, now)
+
+    def _evict(self, connection, now):
+        connection.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        count = connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+            "entries": len(self),
+        }
+
+
+@functools.cache
+def get_response_cache(path, ttl=86400.0, max_entries=10000, evict_interval=64) -> ResponseCache:
+    """Returns the cache stored at the given path, shared by every client in the process"""
+    return ResponseCache(path, ttl, max_entries, evict_interval)
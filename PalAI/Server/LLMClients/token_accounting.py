@@ -0,0 +1,110 @@
+import functools
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+
+from loguru import logger
+
+
+@functools.cache
+def _get_encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Token counts are estimated, tiktoken is unavailable: {e}")
+        return None
+
+
+def load_encoding() -> bool:
+    """Loads the tokenizer ahead of the first request, tiktoken downloads it on a cold cache
+
+    :return: whether token counts are exact
+    :rtype: bool
+    """
+    return _get_encoding() is not None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens of a text, estimated at 4 characters per token if tiktoken is unavailable"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@dataclass(frozen=True)
+class RequestUsage:
+    agent: str
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost: float
+    timestamp: float
+
+
+class TokenAccounting:
+    def __init__(self, max_requests=256):
+        """Token usage of a client, memory stays constant however many requests are made
+
+        :param max_requests: number of recent requests kept, older ones only count towards the totals
+        :type max_requests: int
+        """
+        self.recent = deque(maxlen=max_requests)
+        self._totals = {}
+
+    def record(self, agent, model, prompt_tokens, completion_tokens, price_rate) -> RequestUsage:
+        """Records the usage of one LLM request
+
+        :param price_rate: price of a token
+        :type price_rate: float
+        :rtype: RequestUsage
+        """
+        usage = RequestUsage(
+            agent=agent or "",
+            model=model or "",
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost=price_rate * (prompt_tokens + completion_tokens),
+            timestamp=time.time(),
+        )
+        self.recent.append(usage)
+
+        totals = self._totals.setdefault(
+            usage.agent,
+            {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0},
+        )
+        totals["requests"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        totals["cost"] += usage.cost
+        return usage
+
+    def agent_totals(self) -> dict:
+        """Totals of every agent since the client was created
+
+        :rtype: dict(str, dict)
+        """
+        return {agent: dict(totals) for agent, totals in self._totals.items()}
+
+    def totals(self) -> dict:
+        """Totals over all agents since the client was created"""
+        totals = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0}
+        for agent_totals in self._totals.values():
+            for key in totals:
+                totals[key] += agent_totals[key]
+        return totals
+
+    def stats(self) -> dict:
+        return {
+            "totals": self.totals(),
+            "agents": self.agent_totals(),
+            "recent": [asdict(usage) for usage in self.recent],
+        }
+
+    def reset(self):
+        self.recent.clear()
+        self._totals.clear()
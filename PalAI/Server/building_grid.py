@@ -0,0 +1,224 @@
+import numpy as np
+
+from PalAI.Server.placeable import Placeable
+
+# Horizontal directions, in the order used for windows, doors and decorations
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+
+class BuildingGrid:
+    def __init__(self, blocks: list[Placeable] = ()):
+        """Sparse index of a building's blocks by position, shared by every stage of the pipeline
+        Stages that add or remove blocks update the index, so it is only built once per request
+
+        :param blocks: blocks to index, later blocks replace earlier ones in the same position
+        :type blocks: list(Placeable)
+        """
+        self._cells: dict[tuple, Placeable] = {}
+        self._layers: dict[int, dict[tuple, Placeable]] = {}
+        self._bounds = None
+        self._layer_bounds: dict[int, tuple] = {}
+        self._facades = None
+        for b in blocks:
+            self.add(b)
+
+    def add(self, block: Placeable, replace=True) -> bool:
+        """Indexes a block
+
+        :param replace: replace the block already in the same position, if any
+        :type replace: bool
+        :return: whether the block was indexed
+        :rtype: bool
+        """
+        key = (block.x, block.y, block.z)
+        if key in self._cells:
+            if not replace:
+                return False
+            self._layers[block.y].pop((block.x, block.z))
+
+        self._cells[key] = block
+        self._facades = None
+        self._layer_bounds.pop(block.y, None)
+        self._layers.setdefault(block.y, {})[(block.x, block.z)] = block
+        if self._bounds is not None:
+            low, high = self._bounds
+            self._bounds = (
+                tuple(map(min, low, key)),
+                tuple(map(max, high, key)),
+            )
+        return True
+
+    def remove(self, block: Placeable):
+        """Removes a block from the index, if it is still the block in its position"""
+        key = (block.x, block.y, block.z)
+        if self._cells.get(key) is not block:
+            return
+        del self._cells[key]
+        layer = self._layers[block.y]
+        del layer[(block.x, block.z)]
+        if not layer:
+            del self._layers[block.y]
+        # Bounds can only shrink, they are recomputed when next needed
+        self._bounds = None
+        self._layer_bounds.pop(block.y, None)
+        self._facades = None
+
+    def get(self, x, y, z) -> Placeable:
+        """Returns the block in a position, None if it is empty
+
+        :rtype: Placeable
+        """
+        return self._cells.get((x, y, z))
+
+    def neighbors(self, x, y, z, directions=DIRECTIONS) -> list[Placeable]:
+        """Returns the block next to a position in each direction, None where it is empty
+
+        :param directions: (dx, dz) offsets, the horizontal directions by default
+        :type directions: tuple(tuple(int))
+        :rtype: list(Placeable)
+        """
+        return [self._cells.get((x + dx, y, z + dz)) for dx, dz in directions]
+
+    def layer(self, y) -> list[Placeable]:
+        """Returns the blocks of a layer, sorted by x and then z
+
+        :rtype: list(Placeable)
+        """
+        layer = self._layers.get(y, {})
+        return [layer[k] for k in sorted(layer)]
+
+    def facades(self) -> "Facades":
+        """Returns the exposed faces of the building, computed once until a block is added or removed
+
+        :rtype: Facades
+        """
+        if self._facades is None:
+            self._facades = Facades(self._cells.values())
+        return self._facades
+
+    def layers(self) -> list[int]:
+        """Returns the height of every non-empty layer, in ascending order
+
+        :rtype: list(int)
+        """
+        return sorted(self._layers)
+
+    def bounds(self) -> tuple[tuple, tuple]:
+        """Minimum and maximum (x, y, z) of the blocks
+
+        :rtype: tuple((int, int, int), (int, int, int))
+        """
+        if self._bounds is None:
+            if not self._cells:
+                raise ValueError("Empty building has no bounds")
+            xs, ys, zs = zip(*self._cells)
+            self._bounds = ((min(xs), min(ys), min(zs)), (max(xs), max(ys), max(zs)))
+        return self._bounds
+
+    def layer_bounds(self, y) -> tuple[tuple, tuple]:
+        """Minimum and maximum (x, z) of the blocks of a layer, such as the footprint of the ground floor
+
+        :rtype: tuple((int, int), (int, int))
+        """
+        if y not in self._layer_bounds:
+            if y not in self._layers:
+                raise ValueError(f"Layer {y} is empty")
+            xs, zs = zip(*self._layers[y])
+            self._layer_bounds[y] = ((min(xs), min(zs)), (max(xs), max(zs)))
+        return self._layer_bounds[y]
+
+    def __contains__(self, position) -> bool:
+        return position in self._cells
+
+    def __iter__(self):
+        return iter(self._cells.values())
+
+    def __len__(self):
+        return len(self._cells)
+
+
+
+class Facades:
+    def __init__(self, blocks: list[Placeable]):
+        """Faces of a building's blocks that are exposed to an empty position, computed at once with array shifts
+        Positions are read when the facades are created, block types are read on every query
+
+        :param blocks: blocks of the building, at most one per position
+        :type blocks: list(Placeable)
+        """
+        self.blocks = list(blocks)
+        if not self.blocks:
+            self.offset = (0, 0, 0)
+            self.index = np.full((0, 0, 0), -1)
+            self.exposed = np.zeros((0, 0, 0, len(DIRECTIONS)), dtype=bool)
+            return
+
+        positions = np.array([(b.y, b.x, b.z) for b in self.blocks], dtype=int)
+        low = positions.min(axis=0)
+        # (y, x, z) of the first position of the arrays
+        self.offset = tuple(low.tolist())
+        # Index of the block in each position, -1 where it is empty
+        self.index = np.full(tuple(positions.max(axis=0) + 1 - low), -1)
+        self.index[tuple((positions - low).T)] = np.arange(len(self.blocks))
+        # Indexed (y, x, z, direction)
+        self.exposed = exposed_faces(self.index >= 0)
+
+    def layer(self, y) -> list[Placeable]:
+        """Returns the blocks of a layer, sorted by x and then z
+
+        :rtype: list(Placeable)
+        """
+        index = self._layer_index(y)
+        return [self.blocks[i] for i in index[index >= 0].tolist()]
+
+    def candidates(self, y, cubes_only=True) -> list[list[Placeable]]:
+        """Returns the blocks of a layer with an exposed face, by direction of the face and sorted by x and then z
+
+        :param cubes_only: only return cubes, the blocks that can have windows and doors
+        :type cubes_only: bool
+        :rtype: list(list(Placeable))
+        """
+        index = self._layer_index(y)
+        if index.size == 0:
+            return [[] for _ in DIRECTIONS]
+
+        exposed = self.exposed[y - self.offset[0]]
+        if cubes_only:
+            occupied = index >= 0
+            cubes = np.zeros(index.shape, dtype=bool)
+            cubes[occupied] = [
+                self.blocks[i].block_type == "CUBE" for i in index[occupied].tolist()
+            ]
+            exposed = exposed & cubes[..., np.newaxis]
+
+        return [
+            [self.blocks[i] for i in index[np.nonzero(exposed[..., d])].tolist()]
+            for d in range(len(DIRECTIONS))
+        ]
+
+    def _layer_index(self, y) -> np.ndarray:
+        y -= self.offset[0]
+        if y < 0 or y >= self.index.shape[0]:
+            return np.full((0, 0), -1)
+        return self.index[y]
+
+
+def exposed_faces(occupied: np.ndarray, directions=DIRECTIONS) -> np.ndarray:
+    """Occupied positions whose neighbor in each direction is empty, positions outside the array are empty
+
+    :param occupied: occupancy indexed (..., x, z), such as (y, x, z) for a whole building
+    :type occupied: np.ndarray(bool)
+    :param directions: (dx, dz) offsets, the horizontal directions by default
+    :type directions: tuple(tuple(int))
+    :return: one mask per direction, indexed (..., x, z, direction)
+    :rtype: np.ndarray(bool)
+    """
+    size_x, size_z = occupied.shape[-2:]
+    padded = np.pad(occupied, [(0, 0)] * (occupied.ndim - 2) + [(1, 1), (1, 1)])
+    return np.stack(
+        [
+            occupied & ~padded[..., 1 + dx : 1 + dx + size_x, 1 + dz : 1 + dz + size_z]
+            for dx, dz in directions
+        ],
+        axis=-1,
+    )
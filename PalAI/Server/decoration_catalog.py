@@ -0,0 +1,143 @@
+import functools
+import json
+from types import MappingProxyType
+
+from PalAI.Server.settings import resource_path
+
+
+class DecorationCatalog:
+    def __init__(self, decorations: list[dict], rooms: list[dict]):
+        """Decorations of a style sheet, expanded with their rotations and indexed for the decorator
+        Catalogs are shared by every request and must not be modified
+
+        :param decorations: decorations as written in the style sheet
+        :type decorations: list(dict)
+        :param rooms: rooms of the style sheet
+        :type rooms: list(dict)
+        """
+        self.rooms = tuple(MappingProxyType(dict(r)) for r in rooms)
+
+        # Decorations as in the style sheet with the default keys, used to create filtered catalogs
+        self.source = tuple(
+            MappingProxyType(
+                {"adjacency": ["", "", "", ""], "limit": 0, "rotation": 0, **d}
+            )
+            for d in decorations
+        )
+
+        rotated = []
+        for d in self.source:
+            adjacency = d["adjacency"]
+            for i in range(1, 4):
+                new_adjacency = [adjacency[-1]] + adjacency[:-1]
+                if new_adjacency != adjacency:
+                    rotated.append(
+                        MappingProxyType({**d, "adjacency": new_adjacency, "rotation": i})
+                    )
+                adjacency = new_adjacency
+
+        empty_decoration = MappingProxyType(
+            {"name": "EMPTY", "adjacency": ["", "", "", ""], "limit": 0, "rotation": 0}
+        )
+        self.decorations = self.source + tuple(rotated) + (empty_decoration,)
+
+        decorations_by_room = {r["name"]: [empty_decoration] for r in self.rooms}
+        decorations_by_room["default"] = [empty_decoration]
+        for d in self.decorations:
+            decorations_by_room[d.get("room", "default")].append(d)
+        self.decorations_by_room = MappingProxyType(
+            {room: tuple(d) for room, d in decorations_by_room.items()}
+        )
+
+        # The first decoration with a name or asset name wins
+        names_by_asset, by_name = {}, {}
+        for d in self.decorations:
+            for asset_name in d.get("asset_name", []) + [d["name"]]:
+                names_by_asset.setdefault(asset_name, d["name"])
+            by_name.setdefault(d["name"], d)
+        self.decoration_names_by_asset = MappingProxyType(names_by_asset)
+        self.decorations_by_name = MappingProxyType(by_name)
+
+        self._index_options()
+
+    def _index_options(self):
+        """Gives every decoration a bit, the options of a block are stored as an int with one bit per decoration"""
+        self.decoration_names = tuple(self.decoration_name(d["name"]) for d in self.decorations)
+        index = {id(d): i for i, d in enumerate(self.decorations)}
+
+        # Options of every decoration name, such as all rotations of a sofa
+        name_masks = {}
+        for i, name in enumerate(self.decoration_names):
+            name_masks[name] = name_masks.get(name, 0) | 1 << i
+        self.name_masks = MappingProxyType(name_masks)
+
+        self.room_masks = MappingProxyType(
+            {
+                room: functools.reduce(lambda mask, d: mask | 1 << index[id(d)], decorations, 0)
+                for room, decorations in self.decorations_by_room.items()
+            }
+        )
+
+        # Only directions with a requirement are checked
+        self.rules = tuple(
+            tuple((i, r) for i, r in enumerate(d["adjacency"]) if r != "")
+            for d in self.decorations
+        )
+
+    def decoration_name(self, asset_name: str) -> str:
+        """Translates the name of an asset to the name of its decoration
+
+        :raises ValueError: if the given name is not found
+        :rtype: str
+        """
+        if asset_name not in self.decoration_names_by_asset:
+            raise ValueError(f"{asset_name} not found in decorations")
+        return self.decoration_names_by_asset[asset_name]
+
+    def filtered(self, decorations) -> "DecorationCatalog":
+        """Catalog of the decorations whose name or asset names include any of the given names
+
+        :param decorations: names requested by the client
+        :type decorations: iterable(str)
+        :rtype: DecorationCatalog
+        """
+        return DecorationCatalog(
+            [
+                d
+                for d in self.source
+                if any(
+                    decoration in d.get("asset_name", []) + [d["name"]]
+                    for decoration in decorations
+                )
+            ],
+            self.rooms,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "DecorationCatalog":
+        with open(path, "r") as file:
+            loaded = json.load(file)
+        return cls(loaded["decorations"], loaded["rooms"])
+
+
+def get_decoration_catalog(style_sheet="decorations.json", decorations=None) -> DecorationCatalog:
+    """Returns the catalog of a style sheet, loaded once per process
+    Catalogs filtered by the decorations requested by clients are kept too, as clients repeat the same filters
+
+    :param decorations: names of the decorations to keep, all of them if None or empty
+    :type decorations: list(str)
+    :rtype: DecorationCatalog
+    """
+    if decorations:
+        return _get_filtered_catalog(style_sheet, frozenset(decorations))
+    return _load_catalog(style_sheet)
+
+
+@functools.cache
+def _load_catalog(style_sheet) -> DecorationCatalog:
+    return DecorationCatalog.load(resource_path(style_sheet))
+
+
+@functools.lru_cache(maxsize=64)
+def _get_filtered_catalog(style_sheet, decorations: frozenset) -> DecorationCatalog:
+    return _load_catalog(style_sheet).filtered(decorations)
@@ -1,14 +1,17 @@
-import copy
-import json
-import os
 import random
+from collections import deque
 from functools import reduce
 
-import numpy as np
 from numpy.core.multiarray import empty
 
+from PalAI.Server.building_grid import BuildingGrid
+from PalAI.Server.decoration_catalog import get_decoration_catalog
 from PalAI.Server.placeable import Placeable
 
+# Neighbors of a block that are not blocks of the floor
+OUTSIDE = -2
+NO_FLOOR = -1
+
 
 class Decorator:
     def __init__(
@@ -23,215 +26,161 @@ class Decorator:
         :type style_sheet: (str) relative path to the style sheet
         """
         self.rng = rng
-        with open(os.path.join(os.path.dirname(__file__), style_sheet), "r") as fptr:
-            loaded = json.load(fptr)
-            self.decorations = loaded["decorations"]
-            self.rooms = loaded["rooms"]
-
-            if decorations is not None and decorations != []:
-                # Filter self.decorations to only include those whose asset_name contains any of the given decorations
-                self.decorations = [
-                    d
-                    for d in self.decorations
-                    if any(
-                        decoration in d.get("asset_name", []) + [d["name"]]
-                        for decoration in decorations
-                    )
-                ]
-
-        rotated_decorations = []
-        for d in self.decorations:
-            if "adjacency" not in d:
-                d["adjacency"] = ["", "", "", ""]
-            if "limit" not in d:
-                d["limit"] = 0
-            if "rotation" not in d:
-                d["rotation"] = 0
-
-            # Rotations
-            adjacency = d["adjacency"]
-            for i in range(1, 4):
-                new_adjacency = [adjacency[-1]] + adjacency[:-1]
-                if new_adjacency != adjacency:
-                    aux = copy.deepcopy(d)
-                    aux["adjacency"] = new_adjacency
-                    aux["rotation"] = i
-                    rotated_decorations.append(aux)
-                adjacency = new_adjacency
-
-        self.decorations += rotated_decorations
-        empty_decoration = {
-            "name": "EMPTY",
-            "adjacency": ["", "", "", ""],
-            "limit": 0,
-            "rotation": 0,
-        }
-        self.decorations.append(empty_decoration)
-
-        self.decorations_by_room = {}
-        for r in self.rooms:
-            self.decorations_by_room[r["name"]] = [empty_decoration]
-        self.decorations_by_room["default"] = [empty_decoration]
-        for d in self.decorations:
-            room = d.get("room", "default")
-            self.decorations_by_room[room].append(d)
+        catalog = get_decoration_catalog(style_sheet, decorations)
+        self.decorations = catalog.decorations
+        self.rooms = catalog.rooms
+        self.decorations_by_room = catalog.decorations_by_room
+
+        # Lookups used while decorating
+        self.decoration_names_by_asset = catalog.decoration_names_by_asset
+        self.decorations_by_name = catalog.decorations_by_name
+        self.decoration_names = catalog.decoration_names
+        self.name_masks = catalog.name_masks
+        self.room_masks = catalog.room_masks
+        self.rules = catalog.rules
 
         self.directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
 
-    def import_building(self, api_building):
+    def import_building(self, api_building, building_grid=None):
         """Imports the building from the API response and creates the necessary data structures
+        Only a view of the ground floor is kept, the building itself is never modified
 
         :param api_building: building (or list of blocks) to be imported
         :type api_building: list(dict)
+        :param building_grid: index of the building, created from the building if None
+        :type building_grid: BuildingGrid
         """
-        self.floor_list: list[Placeable] = copy.deepcopy(api_building)
-        to_remove = []
-        for b in self.floor_list:
-            if b.block_type != Placeable.BlockType.CUBE or b.y > 0 or b.has_door():
-                to_remove.append(b)
-            else:
-                b["options"] = self.decorations
-
-        for i in to_remove:
-            self.floor_list.remove(i)
+        if building_grid is None:
+            building_grid = BuildingGrid(api_building)
+
+        # Cubes of the ground floor without doors, sorted by x and then z
+        self.floor_list: list[Placeable] = [
+            b
+            for b in building_grid.layer(0)
+            if b.block_type == Placeable.BlockType.CUBE and not b.has_door()
+        ]
+        self.floor_rooms = [None] * len(self.floor_list)
 
         if not self.floor_list:
             return
 
-        self.offset_x = min(self.floor_list, key=lambda b: b.x).x
-        self.offset_z = min(self.floor_list, key=lambda b: b.z).z
-        self.size_x = max(self.floor_list, key=lambda b: b.x).x + 1 - self.offset_x
-        self.size_y = max(self.floor_list, key=lambda b: b.y).y + 1
-        self.size_z = max(self.floor_list, key=lambda b: b.z).z + 1 - self.offset_z
-
-        # Grid is indexed (y, x, z) because most transformations happen on a slice of the y axis
-        self.grid = [
-            [[[] for _ in range(self.size_z)] for _ in range(self.size_x)]
-            for _ in range(self.size_y)
-        ]
-        self.pixel_grid = (
-            np.ones((self.size_y, self.size_x, self.size_z), dtype=int) * -1
-        )
-
-        for b in self.floor_list:
-            self.grid[b.y][b.x - self.offset_x][b.z - self.offset_z].append(b)
-            self.pixel_grid[b.y, b.x - self.offset_x, b.z - self.offset_z] = 1
+        # Bounds of the floor cubes, not of the whole layer: doors and other blocks on the edges
+        # are outside the floor. The layer is sorted by x, so only z has to be searched
+        zs = [b.z for b in self.floor_list]
+        self.offset_x, self.offset_z = self.floor_list[0].x, min(zs)
+        self.size_x = self.floor_list[-1].x + 1 - self.offset_x
+        self.size_z = max(zs) + 1 - self.offset_z
 
-        # Remove blocks on top of existing blocks, we are only interested in floors
-        to_remove = []
+        # Neighbors of each floor cell in every direction, as indexes into floor_list
+        positions = {(b.x, b.z): i for i, b in enumerate(self.floor_list)}
+        self.floor_neighbors = []
         for b in self.floor_list:
-            for y in range(b.y + 1, self.size_y):
-                if len(self.grid[y][b.x - self.offset_x][b.z - self.offset_z]) > 0:
-                    extra = self.grid[y][b.x - self.offset_x][b.z - self.offset_z]
-                    self.grid[y][b.x - self.offset_x][b.z - self.offset_z] = []
-                    self.pixel_grid[y][b.x - self.offset_x][b.z - self.offset_z] = -1
-                    if b not in to_remove:
-                        to_remove.append(extra)
+            cell_neighbors = []
+            for dx, dz in self.directions:
+                nx, nz = b.x + dx, b.z + dz
+                if (
+                    nx < self.offset_x
+                    or nz < self.offset_z
+                    or nx - self.offset_x >= self.size_x
+                    or nz - self.offset_z >= self.size_z
+                ):
+                    cell_neighbors.append(OUTSIDE)
                 else:
-                    break  # If there is an empty space above a block there may be another floor above
-
-        for i in to_remove:
-            if i in self.floor_list:
-                self.floor_list.remove(i)
+                    cell_neighbors.append(positions.get((nx, nz), NO_FLOOR))
+            self.floor_neighbors.append(tuple(cell_neighbors))
 
         # Apply rooms
-        if self.floor_list:
-            for r in self.rooms:
-                seed = self.rng.choice(self.floor_list)
-
-                for b in sorted(self.floor_list, key=lambda _: self.rng.random()):
-                    if len(self._get_pos_neighbors((b.y, b.x, b.z))) < 4:
-                        seed = b
-                        break
-
-                open, closed = [], []
-                open.append(seed)
-                i = 0
-                while (
-                    i < int(float(r["coverage"]) * len(self.floor_list))
-                    and len(open) > 0
-                    and len(closed) < len(self.floor_list)
-                ):
-                    i += 1
-                    seed = open.pop(0)
-                    seed["room"] = r["name"]
-                    closed.append(seed)
-                    for b in self._get_pos_neighbors((b.y, b.x, b.z)):
-                        if b not in open and b not in closed:
-                            open.append(b)
-
-            # Recalculate size_y
-            self.size_y = max(self.floor_list, key=lambda b: b.y).y + 1
-
-    def _is_valid_option(self, decoration, block, current_floor_list):
+        cells = range(len(self.floor_list))
+        for r in self.rooms:
+            seed = self.rng.choice(cells)
+
+            for b in sorted(cells, key=lambda _: self.rng.random()):
+                if len(self._get_floor_neighbors(b)) < 4:
+                    seed = b
+                    break
+
+            open, closed = [], []
+            open.append(seed)
+            i = 0
+            while (
+                i < int(float(r["coverage"]) * len(self.floor_list))
+                and len(open) > 0
+                and len(closed) < len(self.floor_list)
+            ):
+                i += 1
+                seed = open.pop(0)
+                self.floor_rooms[seed] = r["name"]
+                closed.append(seed)
+                for b in self._get_floor_neighbors(b):
+                    if b not in open and b not in closed:
+                        open.append(b)
+
+    def _index_floor(self):
+        """Creates the state of the collapse over the imported floor"""
+        self.cells = self.floor_list
+        self.neighbors = self.floor_neighbors
+        self.options = [
+            self.room_masks[room if room is not None else "default"] for room in self.floor_rooms
+        ]
+        self.placed_names = [set() for _ in self.floor_list]
+        self.uncollapsed = _IndexedSet(range(len(self.floor_list)))
+        self.pending = _WorkQueue()
+
+    def _is_valid_option(self, decoration, cell):
         """Evaluates if a decoration can be placed on a block
 
-        :param decoration: decoration to be evaluated
-        :type decoration: dict
-        :param block: block to place the decoration
-        :type block: dict
+        :param decoration: index of the decoration to be evaluated
+        :type decoration: int
+        :param cell: index of the block to place the decoration
+        :type cell: int
         :return: can the decoration be placed on the block
         :rtype: bool
         """
-        for i, r in enumerate(decoration["adjacency"]):
-            if r == "":
-                continue
-
-            ny = block.y
-            nx = block.x + self.directions[i][0]
-            nz = block.z + self.directions[i][1]
-
-            if (
-                ny < 0
-                or nx < self.offset_x
-                or nz < self.offset_z
-                or ny >= self.size_y
-                or nx - self.offset_x >= self.size_x
-                or nz - self.offset_z >= self.size_z
-            ):
+        for i, r in self.rules[decoration]:
+            neighbor = self.neighbors[cell][i]
+            if neighbor == OUTSIDE:
                 if r == "WALL":
                     continue
-                else:
-                    return False
+                return False
 
             if r == "WALL":
                 # There is a wall if there is no block on the position
                 # (walls are boundaries of the building)
-                valid = True
-                for neighbor in self.grid[ny][nx - self.offset_x][nz - self.offset_z]:
-                    if neighbor["type"] == "CUBE":
-                        valid = False
-                return valid
-
-            elif r == "EMPTY":
-                # There is an empty space if there is a block
-                if (
-                    len(self.grid[ny][nx - self.offset_x][nz - self.offset_z]) == 0
-                    or self.grid[ny][nx - self.offset_x][nz - self.offset_z][0]["type"]
-                    != "CUBE"
+                return neighbor == NO_FLOOR
+
+            # An empty space or another decoration both need a block
+            if neighbor == NO_FLOOR:
+                return False
+
+            if r != "EMPTY":
+                # Adjacency to another decoration, either possible or already placed
+                if not (
+                    self.options[neighbor] & self.name_masks.get(r, 0)
+                    or r.lower() in self.placed_names[neighbor]
                 ):
                     return False
-            else:  # Adjacency to another decoration
-                valid = False
-                name = ""
-                for floor in self.grid[ny][nx - self.offset_x][nz - self.offset_z]:
-                    if isinstance(floor, Placeable):
-                        if "options" in floor._additional_keys:
-                            for o in floor._additional_keys["options"]:
-                                if self.asset_name_to_decoration_name(o["name"]) == r:
-                                    valid = True
-                                    break
-                    else:
-                        name = self.asset_name_to_decoration_name(floor["type"])
-                    if name.lower() == r.lower():
-                        valid = True
-                        break
-
-                if not valid:
-                    return False
 
         return True
 
+    def _restrict(self, cell, options):
+        """Sets the options of a block, its neighbors are revalidated if any option was removed"""
+        if options == self.options[cell]:
+            return
+        self.options[cell] = options
+        for neighbor in self.neighbors[cell]:
+            if neighbor >= 0:
+                self.pending.push(neighbor)
+
+    def _propagate(self):
+        """Removes invalid options until every block is consistent with its neighbors"""
+        while self.pending:
+            cell = self.pending.pop()
+            valid = 0
+            for i in _bits(self.options[cell]):
+                if self._is_valid_option(i, cell):
+                    valid |= 1 << i
+            self._restrict(cell, valid)
+
     def asset_name_to_decoration_name(self, asset_name):
         """Translates the name of an asset to the name of the decoration name.
         E.g. The decoration table may produce assets such as 'Art Table 1', this function reverses this mapping.
@@ -242,10 +191,9 @@ class Decorator:
         :return: name of the decoration
         :rtype: str
         """
-        for d in self.decorations:
-            if asset_name in (d.get("asset_name", []) + [d["name"]]):
-                return d["name"]
-        raise ValueError(f"{asset_name} not found in decorations")
+        if asset_name not in self.decoration_names_by_asset:
+            raise ValueError(f"{asset_name} not found in decorations")
+        return self.decoration_names_by_asset[asset_name]
 
     def decorate(self):
         """Creates the list of decorations based on the imported building
@@ -264,76 +212,43 @@ class Decorator:
             d["name"]: 0 for d in self.decorations if d["limit"] > 0
         }
 
-        for y in range(self.size_y):
-            # Initialize options for each block
-            current_floor = [b for b in self.floor_list if b.y == y]
-            for b in current_floor:
-                if "room" in b._additional_keys:
-                    b["options"] = self.decorations_by_room[b["room"]].copy()
-                else:
-                    b["options"] = self.decorations_by_room["default"].copy()
-                to_remove = []
-                for o in b["options"]:
-                    if not self._is_valid_option(o, b, current_floor):
-                        to_remove.append(o)
-
-                for o in to_remove:
-                    b["options"].remove(o)
-
-            while len(current_floor) > 0:
-                # Unlike regular WFC we don't choose the lowest entropy block
-                # This is because of the limits, which means not all blocks will be collapsed
-                # Choosing the lowest entropy would cause the blocks with less options to fill first
-                current_block = sorted(current_floor, key=lambda _: self.rng.random())[
-                    0
-                ]
-                if len(current_block["options"]) == 0:
-                    current_floor.remove(current_block)
-                    continue
+        # Initialize options for each block
+        self._index_floor()
+        for cell in range(len(self.floor_list)):
+            self.pending.push(cell)
+        self._propagate()
+
+        while len(self.uncollapsed) > 0:
+            # Unlike regular WFC we don't choose the lowest entropy block
+            # This is because of the limits, which means not all blocks will be collapsed
+            # Choosing the lowest entropy would cause the blocks with less options to fill first
+            current_block = self.uncollapsed.choice(self.rng)
+            if self.options[current_block] == 0:
+                self.uncollapsed.discard(current_block)
+                continue
 
-                # Get a random decoration but prioritize least used types first
-                current_block["options"] = sorted(
-                    current_block["options"],
-                    key=lambda x: self.rng.random()
-                    - self.used_decorations_count.get(x["name"], 0),
-                )
-                current_decor = self.rng.choice(current_block["options"])
-
-                # Add the chosen decoration
-                self._add_decoration(
-                    current_decor, current_block, placed_decors, current_floor
-                )
-
-                # Recursively apply callbacks
-                self._apply_callback(
-                    current_decor,
-                    current_block,
-                    placed_decors,
-                    current_floor,
-                )
-
-                # Check limit and remove options from other blocks if reached
-                self._check_limits(current_decor, current_floor)
-
-                # Update options of neighbors based on this choice
-                self._update_neighbors(
-                    current_decor, current_block, current_floor, placed_decors
-                )
-
-                # Update the neighbor options based on their own adjacency rules
-                self._validate_cell(
-                    (current_block.y, current_block.x, current_block.z), current_floor
-                )
-
-            return placed_decors
-
-    def _apply_callback(
-        self,
-        current_decoration,
-        current_block,
-        placed_decors,
-        current_floor,
-    ):
+            current_decor = self.decorations[
+                self.rng.choice(list(_bits(self.options[current_block])))
+            ]
+
+            # Add the chosen decoration
+            self._add_decoration(current_decor, current_block, placed_decors)
+
+            # Recursively apply callbacks
+            self._apply_callback(current_decor, current_block, placed_decors)
+
+            # Check limit and remove options from other blocks if reached
+            self._check_limits(current_decor)
+
+            # Update options of neighbors based on this choice
+            self._update_neighbors(current_decor, current_block, placed_decors)
+
+            # Remove the options that are no longer valid
+            self._propagate()
+
+        return placed_decors
+
+    def _apply_callback(self, current_decoration, current_block, placed_decors):
         callbacker = current_decoration
         chosen = None
         while callbacker.get("callback", None) is not None:
@@ -345,9 +260,7 @@ class Decorator:
             rand = self.rng.random() * total_weight
             for option in callbacker["callback"]:
                 if rand < option["weight"]:
-                    chosen = [
-                        i for i in self.decorations if i["name"] == option["name"]
-                    ][0]
+                    chosen = self.decorations_by_name[option["name"]]
                     break
                 rand -= option["weight"]
 
@@ -361,74 +274,37 @@ class Decorator:
                 self.used_decorations_count[chosen["name"]] += 1
 
                 if chosen["name"] != "EMPTY":
-                    self._add_decoration(
-                        chosen, current_block, placed_decors, current_floor
-                    )
+                    self._add_decoration(chosen, current_block, placed_decors)
 
             callbacker = chosen
 
-    def _check_limits(self, decor, current_floor):
+    def _check_limits(self, decor):
         if decor["limit"] > 0:
             self.used_decorations_count[decor["name"]] += 1
             if self.used_decorations_count[decor["name"]] >= decor["limit"]:
-                for b in current_floor:
-                    b["options"] = [
-                        o
-                        for o in b["options"]
-                        if self.asset_name_to_decoration_name(o["name"])
-                        != self.asset_name_to_decoration_name(decor["name"])
-                    ]
-
-    def _validate_cell(self, pos, current_floor):
-        for neighbor in self._get_pos_neighbors(pos):
-            if "options" in neighbor:
-                neighbor["options"] = [
-                    o
-                    for o in neighbor["options"]
-                    if self._is_valid_option(o, neighbor, current_floor)
-                ]
-
-    def _update_neighbors(
-        self, chosen_decor, chosen_block, current_floor, placed_decors
-    ):
+                mask = self.name_masks[self.asset_name_to_decoration_name(decor["name"])]
+                for cell in self.uncollapsed:
+                    self._restrict(cell, self.options[cell] & ~mask)
+
+    def _update_neighbors(self, chosen_decor, chosen_block, placed_decors):
         for i, r in enumerate(chosen_decor["adjacency"]):
-            new_pos = (
-                chosen_block.y,
-                chosen_block.x + self.directions[i][0],
-                chosen_block.z + self.directions[i][1],
-            )
-            if r == "EMPTY":
-                pass
-            elif r == "WALL":
-                pass
-            elif r == "":
-                pass
-            else:
-                placed = False
-                for floor in current_floor:
-                    if (
-                        floor.x == new_pos[1]
-                        and floor.y == new_pos[0]
-                        and floor.z == new_pos[2]
-                    ):
-                        if "options" in floor._additional_keys:
-                            for d in floor["options"]:
-                                if self.asset_name_to_decoration_name(d["name"]) == r:
-                                    self._add_decoration(
-                                        d, floor, placed_decors, current_floor
-                                    )
-                                    placed = True
-                                    break
-                        if placed:
-                            break
-
-    def _add_decoration(self, decor, block, placed_decors, current_floor):
-        if block in current_floor:
-            current_floor.remove(block)
+            if r == "EMPTY" or r == "WALL" or r == "":
+                continue
+
+            neighbor = self.neighbors[chosen_block][i]
+            if neighbor >= 0 and neighbor in self.uncollapsed:
+                # The first option of the neighbor with the required decoration
+                matching = self.options[neighbor] & self.name_masks.get(r, 0)
+                if matching:
+                    decor = self.decorations[next(_bits(matching))]
+                    self._add_decoration(decor, neighbor, placed_decors)
+
+    def _add_decoration(self, decor, cell, placed_decors):
+        self.uncollapsed.discard(cell)
+        block = self.cells[cell]
 
         decor_type = self.rng.choice(decor.get("asset_name", [decor["name"]]))
 
-        y = int(block.y)
         c = {
             "type": decor_type,
             "rotation": decor["rotation"],
@@ -437,28 +313,75 @@ class Decorator:
 
         if c["type"] != "EMPTY":
             placed_decors.append(c)
-            self.grid[y][block.x - self.offset_x][block.z - self.offset_z].append(c)
-
-            self._check_limits(decor, current_floor)
-
-    def _get_pos_neighbors(self, pos):
-        neighbors = []
-        for d in self.directions:
-            new_pos = (pos[0], pos[1] + d[0], pos[2] + d[1])
-
-            if (
-                new_pos[0] < 0
-                or new_pos[1] < self.offset_x
-                or new_pos[2] < self.offset_z
-                or new_pos[0] >= self.size_y
-                or new_pos[1] - self.offset_x >= self.size_x
-                or new_pos[2] - self.offset_z >= self.size_z
-            ):
-                continue
+            self.placed_names[cell].add(
+                self.asset_name_to_decoration_name(decor_type).lower()
+            )
+
+            self._check_limits(decor)
+
+    def _get_floor_neighbors(self, cell):
+        """Indexes of the floor cells next to a cell"""
+        return [n for n in self.floor_neighbors[cell] if n >= 0]
+
+
+def _bits(mask: int):
+    """Indexes of the set bits of a mask, in ascending order"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class _IndexedSet:
+    def __init__(self, items=()):
+        """Set with constant time insertion, removal and random choice"""
+        self._items = []
+        self._positions = {}
+        for i in items:
+            self.add(i)
+
+    def add(self, item):
+        if item not in self._positions:
+            self._positions[item] = len(self._items)
+            self._items.append(item)
+
+    def discard(self, item):
+        i = self._positions.pop(item, None)
+        if i is None:
+            return
+        last = self._items.pop()
+        if last != item:
+            self._items[i] = last
+            self._positions[last] = i
+
+    def choice(self, rng: random.Random):
+        return self._items[rng.randrange(len(self._items))]
+
+    def __contains__(self, item):
+        return item in self._positions
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+
+class _WorkQueue:
+    def __init__(self):
+        """FIFO queue that holds each item at most once"""
+        self._queue = deque()
+        self._queued = set()
+
+    def push(self, item):
+        if item not in self._queued:
+            self._queued.add(item)
+            self._queue.append(item)
 
-            for b in self.grid[new_pos[0]][new_pos[1] - self.offset_x][
-                new_pos[2] - self.offset_z
-            ]:
-                neighbors.append(b)
+    def pop(self):
+        item = self._queue.popleft()
+        self._queued.discard(item)
+        return item
 
-        return neighbors
+    def __len__(self):
+        return len(self._queue)
@@ -1,83 +1,49 @@
 import random
 import re
 
+from PalAI.Server.building_grid import BuildingGrid
 from PalAI.Server.placeable import Placeable
 
 directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
 
 
-def create_doors(building: list[Placeable], rng: random.Random) -> list[Placeable]:
+def create_doors(
+    building: list[Placeable], rng: random.Random, building_grid: BuildingGrid = None
+) -> list[Placeable]:
     """Creates doors in the building
 
     :param building: the building to add the doors to
     :type building: list(Placeable)
+    :param building_grid: index of the building, created from the building if None
+    :type building_grid: BuildingGrid
     :return: list of blocks that have been added doors
     """
+    if building_grid is None:
+        building_grid = BuildingGrid(building)
+
+    facades = building_grid.facades()
 
-    offset_x = min(building, key=lambda b: b.x).x
-    offset_z = min(building, key=lambda b: b.z).z
-    size_x = max(building, key=lambda b: b.x).x + 1 - offset_x
-    size_z = max(building, key=lambda b: b.z).z + 1 - offset_z
-
-    # Grid is indexed (x, z)
-    grid = [[None for _ in range(size_z)] for _ in range(size_x)]
-    full_grid = [[None for _ in range(size_z)] for _ in range(size_x)]
-
-    for b in building:
-        if b.y != 0:
-            continue
-
-        # full_grid contains all ground floor blocks
-        full_grid[b.x - offset_x][b.z - offset_z] = b
-        if b.block_type != "CUBE":
-            continue
-        grid[b.x - offset_x][b.z - offset_z] = b
-
-    # stores only the blocks that can have doors, organized by layer, then by direction of door
-    candidates = [[] for _ in range(4)]
-    for x in range(size_x):
-        for z in range(size_z):
-            cell = grid[x][z]
-            if cell is not None and cell.block_type == "CUBE":
-                for i, d in enumerate(directions):
-                    # a block can have a door if the block in the direction of the door is None
-                    if (
-                        x + d[0] < 0
-                        or x + d[0] >= size_x
-                        or z + d[1] < 0
-                        or z + d[1] >= size_z
-                        or full_grid[x + d[0]][z + d[1]] is None
-                    ):
-                        candidates[i].append(cell)
+    # stores only the blocks that can have doors, organized by direction of door
+    # a block can have a door if the block in the direction of the door is empty
+    candidates = facades.candidates(0)
 
     if candidates == [[] for _ in range(4)]:
-        for x in range(size_x):
-            for z in range(size_z):
-                cell = full_grid[x][z]
-                if cell is not None:
-                    for i, d in enumerate(directions):
-                        # a block can have a door if the block in the direction of the door is None
-                        if (
-                            x + d[0] < 0
-                            or x + d[0] >= size_x
-                            or z + d[1] < 0
-                            or z + d[1] >= size_z
-                            or full_grid[x + d[0]][z + d[1]] is None
-                        ):
-                            cell.block_type = Placeable.BlockType.CUBE
-                            candidates[i].append(cell)
-
-    door_count = _decide_door_count(candidates, building)
+        candidates = facades.candidates(0, cubes_only=False)
+        for side in candidates:
+            for cell in side:
+                cell.block_type = Placeable.BlockType.CUBE
+
+    door_count = _decide_door_count(candidates, facades.layer(0))
     building = _create_doors(candidates, door_count, rng)
 
     return building
 
 
 def _decide_door_count(
-    candidates: list[list[Placeable]], building: list[Placeable]
+    candidates: list[list[Placeable]], ground_floor: list[Placeable]
 ) -> int:
     total_candidates = sum(len(c) for c in candidates)
-    ground_floor = len([b for b in building if b.y == 0])
+    ground_floor = len(ground_floor)
     if ground_floor == 0 or total_candidates == 0:
         return 0
 
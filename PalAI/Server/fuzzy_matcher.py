@@ -0,0 +1,124 @@
+import functools
+import weakref
+from collections import OrderedDict
+
+import Levenshtein
+import sentry_sdk
+
+
+class FuzzyMatcher:
+    def __init__(self, candidates, cache_size=1024):
+        """Resolves unsanitized LLM output to the most similar of a fixed set of candidates
+
+        :param candidates: possible choices, earlier candidates win ties
+        :type candidates: list(str)
+        :param cache_size: maximum number of resolved responses to remember
+        :type cache_size: int
+        """
+        self.candidates = tuple(candidates)
+        if len(self.candidates) == 0:
+            raise ValueError("FuzzyMatcher requires at least one candidate")
+
+        self._exact = frozenset(self.candidates)
+        self._folded = {}
+        for c in self.candidates:
+            self._folded.setdefault(c.casefold(), c)
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+        self.exact_hits = 0
+        self.cache_hits = 0
+        self.misses = 0
+
+    def match(self, response: str) -> str:
+        """Returns the candidate most similar to the response
+
+        :param response: unsanitized text
+        :type response: str
+        :return: chosen candidate
+        :rtype: str
+        """
+        if response in self._exact:
+            self.exact_hits += 1
+            return response
+
+        folded = self._folded.get(response.casefold())
+        if folded is not None:
+            self.exact_hits += 1
+            return folded
+
+        if response in self._cache:
+            self.cache_hits += 1
+            self._cache.move_to_end(response)
+            return self._cache[response]
+
+        self.misses += 1
+        _report_miss()
+        choice = self._closest(response)
+        self._cache[response] = choice
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return choice
+
+    def _closest(self, response: str) -> str:
+        best, best_distance = None, None
+        for c in self.candidates:
+            # Distances above the cutoff are not computed in full
+            distance = Levenshtein.distance(c, response, score_cutoff=best_distance)
+            if best_distance is None or distance < best_distance:
+                best, best_distance = c, distance
+                if distance == 0:
+                    break
+        return best
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.exact_hits + self.cache_hits + self.misses
+        if total == 0:
+            return 0.0
+        return (self.exact_hits + self.cache_hits) / total
+
+    def stats(self) -> dict:
+        return {
+            "exact_hits": self.exact_hits,
+            "cache_hits": self.cache_hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
+
+
+def _report_miss():
+    # Only misses are sent, hits stay on the fast path and are counted locally (see total_stats)
+    sentry_sdk.metrics.incr(key="Fuzzy Match Miss", value=1, tags={"service": "PALAI"})
+
+
+# Matchers created by get_matcher, to report their counters
+_matchers = weakref.WeakSet()
+
+
+@functools.lru_cache(maxsize=64)
+def get_matcher(candidates: tuple) -> FuzzyMatcher:
+    """Returns the matcher for a set of candidates, created once per process
+
+    :param candidates: possible choices
+    :type candidates: tuple(str)
+    :rtype: FuzzyMatcher
+    """
+    matcher = FuzzyMatcher(candidates)
+    _matchers.add(matcher)
+    return matcher
+
+
+def total_stats() -> dict:
+    """Counters of every shared matcher of the process, matchers evicted from the cache are not included"""
+    totals = {"matchers": 0, "exact_hits": 0, "cache_hits": 0, "misses": 0}
+    for matcher in list(_matchers):
+        totals["matchers"] += 1
+        for key in ("exact_hits", "cache_hits", "misses"):
+            totals[key] += getattr(matcher, key)
+    total = totals["exact_hits"] + totals["cache_hits"] + totals["misses"]
+    totals["hit_rate"] = (
+        (totals["exact_hits"] + totals["cache_hits"]) / total if total > 0 else 0.0
+    )
+    return totals
@@ -2,53 +2,58 @@ import random
 
 import numpy as np
 
-from PalAI.Server.placeable import Placeable
+from PalAI.Server.building_grid import DIRECTIONS, BuildingGrid
+from PalAI.Server.placeable import BLOCK_TYPES, Placeable
 
 
-def create_gardens(building: list[Placeable], rng: random.Random) -> list[Placeable]:
+# Garden plots are stored as codes into BLOCK_TYPES until the Placeables are created
+EMPTY = -1
+SMALL_GARDEN = BLOCK_TYPES.index(Placeable.BlockType.SMALL_GARDEN)
+LARGE_GARDEN = BLOCK_TYPES.index(Placeable.BlockType.LARGE_GARDEN)
+GARDEN_LIGHT = BLOCK_TYPES.index(Placeable.BlockType.GARDEN_LIGHT)
+PLOT_DTYPE = np.dtype([("type", np.int8), ("rotation", np.int8)])
+
+
+def create_gardens(
+    building: list[Placeable], rng: random.Random, building_grid: BuildingGrid = None
+) -> list[Placeable]:
     """Creates the garden for a given building
 
     :param building: input building, will be used to determine size and placement according to doors
+    :param building_grid: index of the building, created from the building if None
+    :type building_grid: BuildingGrid
     :return: list of garden plots
     """
+    if building_grid is None:
+        building_grid = BuildingGrid(building)
 
     # We need the "bounding" box of the house, as seen from above
-    ground_floor = [b for b in building if b.y == 0]
-    min_x = min(ground_floor, key=lambda b: b.x).x
-    max_x = max(ground_floor, key=lambda b: b.x).x
-    min_z = min(ground_floor, key=lambda b: b.z).z
-    max_z = max(ground_floor, key=lambda b: b.z).z
+    building_area = building_grid.layer_bounds(0)
 
     directions = ((1, 0), (0, 1), (-1, 0), (0, -1))
     chosen_rotation = rng.choice(directions)
 
-    garden_area = _choose_garden_area(((min_x, min_z), (max_x, max_z)), chosen_rotation)
+    garden_area = _choose_garden_area(building_area, chosen_rotation)
     garden_size = (
         abs(garden_area[1][0] - garden_area[0][0]),
         abs(garden_area[1][1] - garden_area[0][1]),
     )
-    garden = []
-    for x in range(garden_area[0][0], garden_area[1][0] + 1):
-        for z in range(garden_area[0][1], garden_area[1][1] + 1):
-            garden.append(Placeable(Placeable.BlockType.SMALL_GARDEN, x, 0, z))
-
-    # Removes gardens in front of the door
-    for b in building:
-        if b.tags is not None and len(b.tags) > 0:
-            for t in b.tags:
-                t: Placeable
-                if t.block_type == Placeable.BlockType.DOOR:
-                    d = (t.x - b.x, t.z - b.z)
-                    # there is a better data structure for this, but this is fine for now
-                    for k in range(max(garden_size)):
-                        for g in garden:
-                            if g.x == t.x + d[0] * k and g.z == t.z + d[1] * k:
-                                garden.remove(g)
-
-    # Join gardens together
-    garden_array = np.empty((garden_size[0] + 1, garden_size[1] + 1), dtype=Placeable)
-    for g in garden:
-        garden_array[g.x - garden_area[0][0], g.z - garden_area[0][1]] = g
+    # Indexed (x, z) from the corner of the garden area
+    garden_array = np.zeros((garden_size[0] + 1, garden_size[1] + 1), dtype=PLOT_DTYPE)
+    garden_array["type"] = SMALL_GARDEN
+
+    # Removes gardens in front of the door, doors are only placed on exposed faces of the ground floor
+    steps = np.arange(max(garden_size))
+    exposed = building_grid.facades().candidates(0, cubes_only=False)
+    for d, side in zip(DIRECTIONS, exposed):
+        for b in side:
+            for t in b.tags or ():
+                if t.block_type == Placeable.BlockType.DOOR and (t.x - b.x, t.z - b.z) == d:
+                    _carve(
+                        garden_array,
+                        t.x + d[0] * steps - garden_area[0][0],
+                        t.z + d[1] * steps - garden_area[0][1],
+                    )
 
     # Garden size is 1 smaller than the number of gardens
     if garden_size[0] >= 3 and garden_size[1] >= 3:
@@ -59,16 +64,27 @@ def create_gardens(building: list[Placeable], rng: random.Random) -> list[Placea
         create_generic_garden(garden_size, garden_array, rng)
 
     garden = []
-    for x in range(garden_size[0] + 1):
-        for z in range(garden_size[1] + 1):
-            if garden_array[x, z] is not None:
-                garden.append(garden_array[x, z])
+    for (x, z), (t, r) in zip(
+        np.argwhere(garden_array["type"] != EMPTY).tolist(),
+        garden_array[garden_array["type"] != EMPTY].tolist(),
+    ):
+        g = Placeable(BLOCK_TYPES[t], x + garden_area[0][0], 0, z + garden_area[0][1])
+        g.rotation = r
+        garden.append(g)
     return garden
 
 
+def _carve(garden_array, xs, zs):
+    """Removes the plots at the given positions, positions outside the garden are ignored"""
+    inside = (
+        (xs >= 0) & (xs < garden_array.shape[0]) & (zs >= 0) & (zs < garden_array.shape[1])
+    )
+    garden_array["type"][xs[inside], zs[inside]] = EMPTY
+
+
 def create_generic_garden(garden_size, garden_array, rng: random.Random):
-    if garden_array[0, 0] is not None:
-        garden_array[0, 0].block_type = Placeable.BlockType.GARDEN_LIGHT
+    if garden_array["type"][0, 0] != EMPTY:
+        garden_array["type"][0, 0] = GARDEN_LIGHT
     return
 
 
@@ -80,78 +96,47 @@ def place_lights(garden_array, garden_size, limit=0):
         (garden_size[0], 0),
         (garden_size[0], garden_size[1]),
     )
+    types = garden_array["type"]
     for p in positions:
-        if garden_array[p[0], p[1]] is not None:
-            if (p[0] == 0 or p[0] == garden_size[0]) and (
-                p[1] == 0 or p[1] == garden_size[1]
-            ):
-                garden_array[p[0], p[1]].block_type = Placeable.BlockType.GARDEN_LIGHT
-                placed_lights += 1
-                if placed_lights == limit:
-                    return
+        if types[p] != EMPTY:
+            types[p] = GARDEN_LIGHT
+            placed_lights += 1
+            if placed_lights == limit:
+                return
 
 
 def create_3x3_garden(garden_size, garden_array, rng: random.Random):
     # Set lights first
     place_lights(garden_array, garden_size, 2)
-
-    # Align gardens and replacewith large
-    alignment = rng.choice([0, 1])
-    for x in range(garden_size[0] + 1):
-        for z in range(garden_size[1] + 1):
-            if garden_array[x, z] is not None:
-                if (x == 0 or x == garden_size[0]) and (z == 0 or z == garden_size[1]):
-                    continue  # This is where lights are placed
-                if alignment == 0:
-                    if (
-                        z < garden_size[1]
-                        and garden_array[x, z + 1] is not None
-                        and garden_array[x, z + 1].block_type
-                        == Placeable.BlockType.SMALL_GARDEN
-                    ):
-                        garden_array[x, z].block_type = Placeable.BlockType.LARGE_GARDEN
-                        garden_array[x, z + 1] = None
-                else:
-                    if (
-                        x < garden_size[0]
-                        and garden_array[x + 1, z] is not None
-                        and garden_array[x + 1, z].block_type
-                        == Placeable.BlockType.SMALL_GARDEN
-                    ):
-                        garden_array[x, z].block_type = Placeable.BlockType.LARGE_GARDEN
-                        garden_array[x, z].rotation = 3
-                        garden_array[x + 1, z] = None
+    _join_gardens(garden_size, garden_array, rng)
 
 
 def create_4x4_garden(garden_size, garden_array, rng: random.Random):
     place_lights(garden_array, garden_size, 4)
+    _join_gardens(garden_size, garden_array, rng)
+
 
-    # Align gardens and replacewith large
+def _join_gardens(garden_size, garden_array, rng: random.Random):
+    """Replaces pairs of small gardens with large ones, along a random axis"""
+    types = garden_array["type"]
     alignment = rng.choice([0, 1])
+    if alignment == 1:
+        # Pairs along x are joined the same way on the transposed plot
+        types = types.T
+        garden_size = (garden_size[1], garden_size[0])
+
     for x in range(garden_size[0] + 1):
-        for z in range(garden_size[1] + 1):
-            if garden_array[x, z] is not None:
-                if (x == 0 or x == garden_size[0]) and (z == 0 or z == garden_size[1]):
-                    continue  # This is where lights are placed
-                if alignment == 0:
-                    if (
-                        z < garden_size[1]
-                        and garden_array[x, z + 1] is not None
-                        and garden_array[x, z + 1].block_type
-                        == Placeable.BlockType.SMALL_GARDEN
-                    ):
-                        garden_array[x, z].block_type = Placeable.BlockType.LARGE_GARDEN
-                        garden_array[x, z + 1] = None
-                else:
-                    if (
-                        x < garden_size[0]
-                        and garden_array[x + 1, z] is not None
-                        and garden_array[x + 1, z].block_type
-                        == Placeable.BlockType.SMALL_GARDEN
-                    ):
-                        garden_array[x, z].block_type = Placeable.BlockType.LARGE_GARDEN
-                        garden_array[x, z].rotation = 3
-                        garden_array[x + 1, z] = None
+        for z in range(garden_size[1]):
+            if types[x, z] == EMPTY:
+                continue
+            if (x == 0 or x == garden_size[0]) and z == 0:
+                continue  # This is where lights are placed
+            if types[x, z + 1] == SMALL_GARDEN:
+                types[x, z] = LARGE_GARDEN
+                types[x, z + 1] = EMPTY
+
+    if alignment == 1:
+        garden_array["rotation"][garden_array["type"] == LARGE_GARDEN] = 3
 
 
 def _choose_garden_area(building_area: tuple[tuple[float]], door_rotation: tuple[int]):
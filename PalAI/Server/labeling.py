@@ -0,0 +1,68 @@
+import numpy as np
+
+
+def label(mask: np.ndarray) -> np.ndarray:
+    """Labels the connected components of a mask, moving only along the axes (6 neighbours in 3D)
+    Union-find over all adjacent pairs at once: the root of every pair is hooked to the smaller root
+    and paths are compressed, so the number of passes doesn't depend on the length of the components
+
+    :param mask: cells to be labeled
+    :type mask: np.ndarray(bool)
+    :return: label of each cell, the smallest flat index of its component, -1 outside the mask
+    :rtype: np.ndarray(int)
+    """
+    flat = mask.ravel()
+    parent = np.arange(flat.size)
+
+    # Pairs of adjacent cells of the mask along every axis, as flat indexes
+    indexes = np.arange(flat.size).reshape(mask.shape)
+    first, second = [], []
+    for axis in range(mask.ndim):
+        lower = [slice(None)] * mask.ndim
+        upper = [slice(None)] * mask.ndim
+        lower[axis] = slice(None, -1)
+        upper[axis] = slice(1, None)
+        both = mask[tuple(lower)] & mask[tuple(upper)]
+        first.append(indexes[tuple(lower)][both])
+        second.append(indexes[tuple(upper)][both])
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+
+    while True:
+        roots_first, roots_second = parent[first], parent[second]
+        different = roots_first != roots_second
+        if not different.any():
+            break
+        # Parents always point to smaller indexes, so no cycles are created
+        np.minimum.at(
+            parent,
+            np.maximum(roots_first, roots_second)[different],
+            np.minimum(roots_first, roots_second)[different],
+        )
+        first, second = first[different], second[different]
+        parent = _compress(parent)
+
+    return np.where(flat, parent, -1).reshape(mask.shape)
+
+
+def _compress(parent: np.ndarray) -> np.ndarray:
+    # Points every cell to its root, each pass halves the longest path
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+
+def flood_fill(mask: np.ndarray, seeds: np.ndarray) -> np.ndarray:
+    """Finds every cell of a mask connected to the seeds, moving only along the axes (6 neighbours in 3D)
+
+    :param mask: cells that can be traversed
+    :type mask: np.ndarray(bool)
+    :param seeds: cells to start from, seeds outside the mask are ignored
+    :type seeds: np.ndarray(bool)
+    :return: cells of the mask connected to any seed
+    :rtype: np.ndarray(bool)
+    """
+    labels = label(mask)
+    return mask & np.isin(labels, labels[seeds & mask])
@@ -0,0 +1,110 @@
+import functools
+import json
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+
+from PalAI.Server.placeable import BLOCK_TYPES, Placeable
+from PalAI.Server.settings import resource_path
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+@dataclass(frozen=True)
+class Layer:
+    """Preset layer with its footprint stored as compact arrays
+
+    :param positions: (x, z) position of each block
+    :param types: index of each block's type in BLOCK_TYPES
+    :param rotations: rotation of each block
+    """
+
+    name: str
+    description: str
+    positions: np.ndarray
+    types: np.ndarray
+    rotations: np.ndarray
+
+    @classmethod
+    def from_json(cls, data: dict):
+        blocks = data["blocks"]
+        positions = np.array([(b["x"], b["z"]) for b in blocks], dtype=int)
+        types = np.array(
+            [BLOCK_TYPES.index(Placeable.BlockType(b.get("type", "CUBE"))) for b in blocks],
+            dtype=np.int8,
+        )
+        rotations = np.array([b.get("rotation", 0) for b in blocks], dtype=np.int8)
+        return cls(
+            data["name"],
+            data["description"],
+            _read_only(positions.reshape(-1, 2)),
+            _read_only(types),
+            _read_only(rotations),
+        )
+
+    def stamp(self, y: int) -> list[Placeable]:
+        """Creates the blocks of this layer at the given height
+
+        :param y: height of the layer
+        :type y: int
+        :return: blocks of the layer
+        :rtype: list(Placeable)
+        """
+        blocks = []
+        for (x, z), t, r in zip(
+            self.positions.tolist(), self.types.tolist(), self.rotations.tolist()
+        ):
+            p = Placeable(BLOCK_TYPES[t], x, y, z)
+            p.rotation = r
+            blocks.append(p)
+        return blocks
+
+
+class LayerCatalog:
+    def __init__(self, layers: list[Layer]):
+        """Immutable collection of the preset layers, indexed by name
+
+        :param layers: layers in the order they are presented to the architect
+        :type layers: list(Layer)
+        """
+        self.layers = tuple(layers)
+        self.names = tuple(l.name for l in self.layers)
+
+        by_name = {}
+        for l in self.layers:
+            by_name.setdefault(l.name, l)  # the first layer with a name takes priority
+        self._by_name = MappingProxyType(by_name)
+
+        self.described_layers = "".join(f"{l.name}: {l.description}\n" for l in self.layers)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r") as file:
+            return cls([Layer.from_json(l) for l in json.load(file)["layers"]])
+
+    def __getitem__(self, name: str) -> Layer:
+        return self._by_name[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __len__(self):
+        return len(self.layers)
+
+
+@functools.cache
+def get_layer_catalog() -> LayerCatalog:
+    """Returns the catalog of layers.json, loaded once per process"""
+    return LayerCatalog.load(resource_path("layers.json"))
+
+
+@functools.cache
+def get_windows() -> dict:
+    """Returns the window styles and quantifiers of windows.json, loaded once per process
+    The result is shared by every request and must not be modified"""
+    with open(resource_path("windows.json"), "r") as file:
+        return json.load(file)
@@ -1,17 +1,20 @@
+import asyncio
 import json
-import os
 import random
-from configparser import RawConfigParser
+from contextlib import aclosing
 from dataclasses import dataclass
 
-import Levenshtein
 import sentry_sdk
 from colorama import Fore
 from loguru import logger
 
 import PalAI.Server.door_layer as door_layer
+import PalAI.Server.fuzzy_matcher as fuzzy_matcher
 import PalAI.Server.gardener as gardener
+import PalAI.Server.layer_catalog as layer_catalog
+import PalAI.Server.settings as settings
 import PalAI.Server.window_layer as window_layer
+from PalAI.Server.building_grid import BuildingGrid
 from PalAI.Server.decorator import Decorator
 from PalAI.Server.LLMClients import gpt_client
 from PalAI.Server.LLMClients.llm_client import LLMClient
@@ -44,7 +47,7 @@ class PalAI:
         def layers_only():
             return PalAI.PalAIRequest(False, False, False, False, False, False)
 
-    def __init__(self, prompts_file, llm, web_socket=None, rng=None):
+    def __init__(self, prompts_file, llm, web_socket=None, rng=None, config=None):
         """
         :param prompts_file: all prompts to be used
         :type prompts_file: dict
@@ -52,6 +55,8 @@ class PalAI:
         :type llm: str or LLMClient
         :param web_socket: web socket to send messages to
         :type web_socket: web_socket
+        :param config: settings to use instead of the process settings
+        :type config: Settings
         """
 
         materials = [
@@ -93,12 +98,12 @@ class PalAI:
         elif llm is not None:
             self.llm_client = llm
 
-        with open(os.path.join(os.path.dirname(__file__), "layers.json"), "r") as file:
-            self.layers = json.load(file)["layers"]
-
-        with open(os.path.join(os.path.dirname(__file__), "windows.json"), "r") as file:
-            self.windows = json.load(file)
+        # Shared by every request, loaded once per process
+        self.layer_catalog = layer_catalog.get_layer_catalog()
+        self.windows = layer_catalog.get_windows()
         self.building: list[Placeable] = []
+        self.building_grid = BuildingGrid()
+        self.layers_streamed = False
         self.history = []
         self.api_result = {}
 
@@ -108,19 +113,14 @@ class PalAI:
             self.rng = rng
         self.post_process = PostProcess()
 
-        config_path = os.getenv("CONFIG_PATH", "config.ini")
-        self.config = RawConfigParser()
-        self.config.read(
-            os.path.join(os.path.dirname(__file__), "../../" + config_path)
-        )
+        # Parsed once per process, never re-read per request
+        self.config = config if config is not None else settings.get_settings()
 
         self.ws = web_socket
         self.prompts_file = prompts_file
         self.system_prompt = self.prompts_file.get("system_prompt", "")
         self.prompt_template = self.prompts_file.get("prompt_template", "")
 
-        os.chdir(os.path.dirname(__file__))
-
     @sentry_sdk.trace
     async def build(
         self,
@@ -161,10 +161,34 @@ class PalAI:
 
         logger.info(f"{Fore.BLUE}Received prompt: {prompt}{Fore.RESET}")
 
+        # The artist only needs the original prompt, so it is requested alongside the architect
+        # Its response is still processed and sent at its usual place in the pipeline
+        artist_request = None
+        if request_type is None or request_type.create_materials:
+            artist_request = asyncio.create_task(self.request_artist_response())
+
+        try:
+            await self._run_stages(request_type, artist_request)
+        finally:
+            if artist_request is not None and not artist_request.done():
+                artist_request.cancel()
+
+        self.api_result["result"] = [i.to_json() for i in self.building]
+        logger.info(f"{Fore.GREEN}Finished Request{Fore.RESET}")
+        return self.api_result
+
+    async def _run_stages(self, request_type: PalAIRequest, artist_request: asyncio.Task):
+        """Runs every stage of the pipeline in the order the client expects its events
+
+        :param request_type: stages to run, all of them if None
+        :param artist_request: artist response that was requested concurrently
+        """
         await self.get_architect_plan()
         logger.info(f"{Fore.BLUE}Received architect plan {self.plan_list}{Fore.RESET}")
 
         await self.build_structure()
+        # Index shared by every later stage, stages keep it up to date
+        self.building_grid = BuildingGrid(self.building)
 
         logger.info(f"{Fore.BLUE}Received basic structure{Fore.RESET}")
 
@@ -173,7 +197,7 @@ class PalAI:
             logger.info(f"{Fore.BLUE}Received add-ons{Fore.RESET}")
 
         if request_type is None or request_type.create_materials:
-            await self.get_artist_response()
+            await self.get_artist_response(await artist_request)
             logger.info(f"{Fore.BLUE}Received artist response{Fore.RESET}")
 
         if request_type is None or request_type.apply_post_process:
@@ -192,22 +216,20 @@ class PalAI:
             await self.decorate()
             logger.info(f"{Fore.BLUE}Obtained decorations{Fore.RESET}")
 
-        self.api_result["result"] = [i.to_json() for i in self.building]
-        logger.info(f"{Fore.GREEN}Finished Request{Fore.RESET}")
-        return self.api_result
-
     @sentry_sdk.trace
     async def get_architect_plan(self):
         """Gets the architect's plan for the building"""
-        described_layers = ""
-        for l in self.layers:
-            described_layers += f"{l['name']}: {l['description']}\n"
-
-        self.prompt = await self.llm_client.get_agent_response(
-            LLMClient.ARCHITECT,
-            self.prompts_file["plan_prompt"].format(self.prompt),
-            presets=described_layers,
-        )
+        described_layers = self.layer_catalog.described_layers
+        plan_prompt = self.prompts_file["plan_prompt"].format(self.prompt)
+
+        if self.config.getboolean("socket", "stream_layers", fallback=False):
+            self.prompt = await self._stream_architect_plan(plan_prompt, described_layers)
+        else:
+            self.prompt = await self.llm_client.get_agent_response(
+                LLMClient.ARCHITECT,
+                plan_prompt,
+                presets=described_layers,
+            )
         self.api_result["architect"] = [l for l in self.prompt.split("\n") if l != ""]
         self.plan_list = [
             i
@@ -228,47 +250,108 @@ class PalAI:
 
         return
 
-    @sentry_sdk.trace
-    async def build_structure(self):
-        for y, l in enumerate(self.plan_list):
-            if "|" in l:
-                l = l.split("|")[0]
-            l = l.split(":")
-            if len(l) < 2:
-                if self.ws is not None and self.config.getboolean(
-                    "socket", "layer", fallback=True
-                ):
-                    await self.manager.send_personal_message(
-                        json.dumps(
-                            {
-                                "message": "Error processing request",
-                                "error": " Unable to read " + str(l),
-                            }
-                        ),
-                        self.ws,
-                    )
+    async def _stream_architect_plan(self, plan_prompt, described_layers):
+        """Streams the architect's plan, each layer is built and sent to the client as soon as its line is complete
+
+        :param plan_prompt: formatted prompt for the architect
+        :type plan_prompt: str
+        :param described_layers: presets available to the architect
+        :type described_layers: str
+        :return: complete architect response
+        :rtype: str
+        """
+        self.layers_streamed = True
+        layer_count = 0
+        failed = False
+
+        async def stream_line(line):
+            nonlocal layer_count, failed
+            if failed or not line.lstrip().lower().startswith("layer"):
                 return
-            chosen_layer = self._get_similarity_response(
-                l[1], [i["name"] for i in self.layers]
+            blocks = await self._add_layer(layer_count, line)
+            if blocks is None:
+                failed = True  # Same as build_structure, no layers are added after an error
+                return
+            layer_count += 1
+
+            if self.ws is not None and self.config.getboolean(
+                "socket", "layer", fallback=True
+            ):
+                message = {"value": [b.to_json() for b in blocks]}
+                message["event"] = "layer"
+                await self.manager.send_personal_message(json.dumps(message), self.ws)
+
+        response, pending = "", ""
+        # The stream is closed right away if sending a layer fails, so its LLM slot is released
+        async with aclosing(
+            self.llm_client.stream_agent_response(
+                LLMClient.ARCHITECT,
+                plan_prompt,
+                presets=described_layers,
             )
-            logger.info(f"{Fore.BLUE}Chosen Layer: {chosen_layer}{Fore.RESET}")
-            blocks = [i for i in self.layers if i["name"] == chosen_layer][0]["blocks"]
-            for b in blocks:
-                p = Placeable(b.get("type", "CUBE"), b["x"], y, b["z"])
-                p.rotation = b.get("rotation", 0)
-                self.building.append(p)
+        ) as stream:
+            async for chunk in stream:
+                response += chunk
+                *lines, pending = (pending + chunk).split("\n")
+                for line in lines:
+                    await stream_line(line)
+        await stream_line(pending)
+
+        return response
+
+    async def _add_layer(self, y, plan_line):
+        """Adds the layer described in a line of the architect's plan to the building
+
+        :param y: height of the layer
+        :type y: int
+        :param plan_line: line of the plan, such as 'Layer 0: 5x5 Square | Explanation'
+        :type plan_line: str
+        :return: the added blocks, None if the line could not be read
+        :rtype: list(Placeable)
+        """
+        l = plan_line
+        if "|" in l:
+            l = l.split("|")[0]
+        l = l.split(":")
+        if len(l) < 2:
+            if self.ws is not None and self.config.getboolean(
+                "socket", "layer", fallback=True
+            ):
+                await self.manager.send_personal_message(
+                    json.dumps(
+                        {
+                            "message": "Error processing request",
+                            "error": " Unable to read " + str(l),
+                        }
+                    ),
+                    self.ws,
+                )
+            return None
+        chosen_layer = self._get_similarity_response(l[1], self.layer_catalog.names)
+        logger.info(f"{Fore.BLUE}Chosen Layer: {chosen_layer}{Fore.RESET}")
+        blocks = self.layer_catalog[chosen_layer].stamp(y)
+        self.building.extend(blocks)
+        return blocks
 
-        if self.ws is not None and self.config.getboolean(
-            "socket", "layer", fallback=True
-        ):
-            json_building = []
-            for l in self.building:
-                json_building.append(l.to_json())
+    @sentry_sdk.trace
+    async def build_structure(self):
+        # When the plan is streamed the layers have already been built and sent
+        if not self.layers_streamed:
+            for y, l in enumerate(self.plan_list):
+                if await self._add_layer(y, l) is None:
+                    return
+
+            if self.ws is not None and self.config.getboolean(
+                "socket", "layer", fallback=True
+            ):
+                json_building = []
+                for l in self.building:
+                    json_building.append(l.to_json())
 
-            message = {"value": json_building}
-            message["event"] = "layer"
+                message = {"value": json_building}
+                message["event"] = "layer"
 
-            await self.manager.send_personal_message(json.dumps(message), self.ws)
+                await self.manager.send_personal_message(json.dumps(message), self.ws)
 
         sentry_sdk.metrics.distribution(
             key="Block Count",
@@ -303,7 +386,7 @@ class PalAI:
         log_additional_data("Add-on Response", windows)
         windows = windows.split("\n")
 
-        height = max([i.y for i in self.building]) + 1
+        height = self.building_grid.bounds()[1][1] + 1
         self.window_styles = [None for _ in range(height)]
         self.window_quantifiers = [None for _ in range(height)]
 
@@ -331,7 +414,11 @@ class PalAI:
                 self.window_quantifiers[i] = "none"
 
         self.building = window_layer.create_windows(
-            self.building, self.window_styles, self.window_quantifiers, self.rng
+            self.building,
+            self.window_styles,
+            self.window_quantifiers,
+            self.rng,
+            self.building_grid,
         )
 
         # Only sending the blocks with add_ons
@@ -347,7 +434,7 @@ class PalAI:
 
     @sentry_sdk.trace
     async def apply_doors(self):
-        doors = door_layer.create_doors(self.building, self.rng)
+        doors = door_layer.create_doors(self.building, self.rng, self.building_grid)
         sentry_sdk.metrics.distribution(
             key="Door Count",
             value=len(doors),
@@ -369,7 +456,7 @@ class PalAI:
 
     @sentry_sdk.trace
     async def create_garden(self):
-        self.garden = gardener.create_gardens(self.building, self.rng)
+        self.garden = gardener.create_gardens(self.building, self.rng, self.building_grid)
         self.api_result["garden"] = [i.to_json() for i in self.garden]
 
         sentry_sdk.metrics.distribution(
@@ -392,14 +479,29 @@ class PalAI:
             await self.manager.send_personal_message(json.dumps(message), self.ws)
 
     @sentry_sdk.trace
-    async def get_artist_response(self):
-        materials_response = await self.llm_client.get_agent_response(
+    async def request_artist_response(self):
+        """Asks the artist for materials and style, which does not depend on the architect's plan
+
+        :return: unprocessed artist response
+        :rtype: str
+        """
+        return await self.llm_client.get_agent_response(
             LLMClient.MATERIALS,
             self.original_prompt,
             materials=self.material_types,
             styles=self.post_process.get_available_styles(),
         )
 
+    @sentry_sdk.trace
+    async def get_artist_response(self, materials_response: str = None):
+        """Applies the artist's materials and style
+
+        :param materials_response: response obtained with request_artist_response, requested if None
+        :type materials_response: str
+        """
+        if materials_response is None:
+            materials_response = await self.request_artist_response()
+
         logger.debug(f"ARTIST RESPONSE: {materials_response}")
         material = {}
         for l in materials_response.split("\n"):
@@ -478,16 +580,16 @@ class PalAI:
         :param possibilities: list of possibilities
         :type possibilities: list(str)
         """
-        aux = sorted(possibilities, key=lambda x: Levenshtein.distance(x, response))
-        return aux[0]
+        return fuzzy_matcher.get_matcher(tuple(possibilities)).match(response)
 
     @sentry_sdk.trace
     async def apply_style(self):
         """Applies the style received from the artist"""
         try:
-            self.post_process.import_building(self.building)
+            self.post_process.import_building(self.building, self.building_grid)
             self.building = self.post_process.style(self.style)
         except Exception as e:
+            self.building_grid = BuildingGrid(self.building)
             self.style = "no style"
             logger.warning(f"{Fore.RED}Style Error {e}{Fore.RESET}")
             await self.manager.send_personal_message(
@@ -497,7 +599,7 @@ class PalAI:
     @sentry_sdk.trace
     async def decorate(self):
         decorator = Decorator(self.rng, self.decorations)
-        decorator.import_building(self.building)
+        decorator.import_building(self.building, self.building_grid)
         self.decorations = decorator.decorate()
 
         self.api_result["decorations"] = self.decorations
@@ -533,17 +635,9 @@ class PalAI:
         :return: structure containing all blocks of both sets, prioritizing the first argument
         :rtype: list(dict)
         """
+        occupied = BuildingGrid(base_structure)
         for b in extra_blocks:
-            if (
-                len(
-                    [
-                        i
-                        for i in base_structure
-                        if (i.x == b.x and i.y == b.y and i.z == b.z)
-                    ]
-                )
-                == 0
-            ):
+            if occupied.add(b, replace=False):
                 base_structure.append(b)
         return base_structure
 
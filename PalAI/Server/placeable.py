@@ -4,6 +4,11 @@ from typing import Self
 
 
 class Placeable:
+    # No per-instance __dict__, buildings hold thousands of blocks
+    __slots__ = (
+        "block_type", "_x", "_y", "_z", "_position", "rotation", "_add_ons", "_additional_keys"
+    )
+
     class BlockType(StrEnum):
         CUBE = "CUBE"
         CYLINDER = "CYLINDER"
@@ -28,9 +33,10 @@ class Placeable:
         if type(block_type) is str:
             block_type = Placeable.BlockType.from_str(block_type)
         self.block_type = block_type
-        self.x = x
-        self.y = y
-        self.z = z
+        self._x = x
+        self._y = y
+        self._z = z
+        self._position = None
         self.rotation = 0
         self._add_ons = []
         self._additional_keys = {}
@@ -66,10 +72,41 @@ class Placeable:
     def tags(self, value: Self):
         self._add_ons = value
 
+    # The position string is read for every block by the decorator and to_json,
+    # it is formatted once and cleared whenever a coordinate changes
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._x = value
+        self._position = None
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._y = value
+        self._position = None
+
+    @property
+    def z(self):
+        return self._z
+
+    @z.setter
+    def z(self, value):
+        self._z = value
+        self._position = None
+
     # Backwards compatibility
     @property
     def position(self) -> str:
-        return f"({self.x},{self.y},{self.z})"
+        if self._position is None:
+            self._position = f"({self._x},{self._y},{self._z})"
+        return self._position
 
     def has_door(self) -> bool:
         if self.tags is None:
@@ -117,3 +154,7 @@ class Placeable:
             return self.rotation
         else:
             return self._additional_keys[key]
+
+
+# Block types stored as indexes into this tuple, such as the preset layers and garden plots
+BLOCK_TYPES = tuple(Placeable.BlockType)
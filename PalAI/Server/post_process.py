@@ -1,10 +1,8 @@
-import json
-import os
-from collections import deque
-
 import numpy as np
 
+from PalAI.Server import labeling, style_registry
 from PalAI.Server.placeable import Placeable
+from PalAI.Server.settings import resource_path
 
 
 class PostProcess:
@@ -14,37 +12,41 @@ class PostProcess:
         :param style_sheet: list of available styles
         :type style_sheet: (str) relative path to the style sheet json
         """
-        with open(os.path.join(os.path.dirname(__file__), style_sheet), "r") as fptr:
-            self.styles = json.load(fptr)
+        # Style sheets are compiled once per process and shared between instances
+        self.style_sheet = style_registry.get_style_sheet(resource_path(style_sheet))
 
-    def import_building(self, building):
+    def import_building(self, building, building_grid=None):
         """Imports a building from a list of blocks, required to be called before applying any style rules
 
         :param building: building to be imported
-        :type building: list(dict) list of blocks
+        :type building: list(Placeable)
+        :param building_grid: index of the building, kept up to date as blocks are added or removed
+        :type building_grid: BuildingGrid
         """
-
-        self.offset_x = min(building, key=lambda b: b.x).x
-        self.offset_y = min(building, key=lambda b: b.y).y
-        self.offset_z = min(building, key=lambda b: b.z).z
-        self.size_x = max(building, key=lambda b: b.x).x + 1 - self.offset_x
-        self.size_y = max(building, key=lambda b: b.y).y + 1 - self.offset_y
-        self.size_z = max(building, key=lambda b: b.z).z + 1 - self.offset_z
+        self.building_grid = building_grid
+        if building_grid is not None:
+            low, high = building_grid.bounds()
+        else:
+            positions = [(b.x, b.y, b.z) for b in building]
+            low = tuple(map(min, zip(*positions)))
+            high = tuple(map(max, zip(*positions)))
+        self.offset_x, self.offset_y, self.offset_z = low
+        self.size_x, self.size_y, self.size_z = (h + 1 - l for l, h in zip(low, high))
 
         # Grid is indexed (y, x, z) because most transformations happen on a slice of the y axis
         self.grid = [
             [[None for _ in range(self.size_z)] for _ in range(self.size_x)]
             for _ in range(self.size_y)
         ]
-        self.pixel_grid = (
-            np.ones((self.size_y, self.size_x, self.size_z), dtype=int) * -1
-        )
 
+        cells = []
         for b in building:
-            self.grid[b.y - self.offset_y][b.x - self.offset_x][b.z - self.offset_z] = b
-            self.pixel_grid[
-                b.y - self.offset_y, b.x - self.offset_x, b.z - self.offset_z
-            ] = 1
+            cell = (b.y - self.offset_y, b.x - self.offset_x, b.z - self.offset_z)
+            self.grid[cell[0]][cell[1]][cell[2]] = b
+            cells.append(cell)
+
+        self.pixel_grid = np.full((self.size_y, self.size_x, self.size_z), -1, dtype=int)
+        self.pixel_grid[tuple(np.array(cells, dtype=int).reshape(-1, 3).T)] = 1
 
     def get_available_styles(self):
         """Returns a list of available styles
@@ -52,75 +54,41 @@ class PostProcess:
         :return: Formatted paragraph of available styles and their descriptions
         :rtype: str
         """
-        styles = ""
-        for s in self.styles["styles"].keys():
-            styles += f"{s}: {self.styles['styles'][s]['description']}\n"
-        return styles
+        return self.style_sheet.get_available_styles()
 
     def get_styles_list(self):
-        return [i.upper() for i in self.styles["styles"].keys()]
+        return self.style_sheet.get_styles_list()
 
     def fill_empty_spaces(self):
         """Fills in empty spaces in the building with cubes
         An empty space is a region of grid spaces that do not contain any blocks
         And are surrounded by blocks on all sides and above (but not necessarily below)
+        A single cube is placed in each empty space, in its first grid space in (y, x, z) order
         """
-        label = 0
-        neighbors = [
-            (0, 0, 1),
-            (0, 0, -1),
-            (0, 1, 0),
-            (0, -1, 0),
-            (1, 0, 0),
-            (-1, 0, 0),
-        ]
-        building_array = np.copy(self.pixel_grid)
-
         # pad outside of the building such that all empty spaces on the edges are connected
-        building_array = np.pad(
-            building_array,
+        empty = np.pad(
+            self.pixel_grid == -1,
             ((0, 1), (1, 1), (1, 1)),
             mode="constant",
-            constant_values=-1,
+            constant_values=True,
         )
-        yDim, xDim, zDim = building_array.shape
-
-        labelArray = np.zeros_like(building_array)
-        statusArray = np.zeros_like(building_array, dtype=bool)
-
-        for k in range(yDim):  # Apply the algorithm layer by layer
-            for i in range(xDim):
-                for j in range(zDim):
-                    if not statusArray[k, i, j]:
-                        if building_array[k, i, j] == -1:  # empty space
-                            label += 1
-                            queue1 = deque()
-                            queue1.append((k, i, j))
-                            while queue1:
-                                y, x, z = queue1.popleft()
-                                if not statusArray[y, x, z]:
-                                    statusArray[y, x, z] = True
-                                    labelArray[y, x, z] = label
-                                    if label > 1:
-                                        # found empty space, fill it in
-                                        p = Placeable(
-                                            "CUBE",
-                                            i - 1 + self.offset_x,
-                                            k + self.offset_y,
-                                            j - 1 + self.offset_z,
-                                        )
-                                        self.grid[k][i - 1][j - 1] = p
-                                        self.pixel_grid[k, i - 1, j - 1] = 1
-                                    for dy, dx, dz in neighbors:
-                                        ny, nx, nz = y + dy, x + dx, z + dz
-                                        if (
-                                            0 <= nx < xDim
-                                            and 0 <= nz < zDim
-                                            and 0 <= ny < yDim
-                                            and not statusArray[ny, nx, nz]
-                                            and building_array[ny, nx, nz] == -1
-                                        ):
-                                            queue1.append((ny, nx, nz))
+        padding = np.ones_like(empty)
+        padding[:-1, 1:-1, 1:-1] = False
+
+        # The regions are labeled in one pass however long or winding they are,
+        # only the first cell of each region not connected to the outside is filled
+        labels = labeling.label(empty)
+        outside = np.isin(labels, labels[padding])
+        first_cells = labels == np.arange(labels.size).reshape(labels.shape)
+        enclosed = (empty & ~outside & first_cells)[:-1, 1:-1, 1:-1]
+
+        for y, x, z in np.argwhere(enclosed).tolist():
+            self.grid[y][x][z] = Placeable(
+                "CUBE", x + self.offset_x, y + self.offset_y, z + self.offset_z
+            )
+            if self.building_grid is not None:
+                self.building_grid.add(self.grid[y][x][z])
+        self.pixel_grid[enclosed] = 1
 
     def style(self, style):
         """Applies the chosen style to the building
@@ -135,50 +103,30 @@ class PostProcess:
             self.remove_floating_blocks()
 
         self.fill_empty_spaces()
-        for s in self.styles["styles"]:
-            if s.upper() == style.upper():
-                for rule in self.styles["styles"][s]["rules"]:
-                    matching_positions = self.apply_kernel(rule["filter"])
-                    for effect in rule["effects"]:
-                        for c in matching_positions:
-                            placeholders = {"rotation": int(c[1])}
-                            block = self.grid[c[0][0]][c[0][1]][c[0][2]]
-                            block[effect["key"]] = effect["value"].format_map(
-                                placeholders
-                            )
-                            if (
-                                not isinstance(block[effect["key"]], int)
-                                and block[effect["key"]].isdigit()
-                            ):
-                                block[effect["key"]] = int(block[effect["key"]])
-                break
-        else:
-            raise ValueError(f"Style {style} not found")
+        for rule in self.style_sheet.get_style(style).rules:
+            matching_positions = self.apply_rotated_filters(rule.filters)
+            for key, values in rule.effects:
+                for c in matching_positions:
+                    self.grid[c[0][0]][c[0][1]][c[0][2]][key] = values[c[1]]
         self.remove_impossible_add_ons()
         return self.export_building()
 
     def remove_floating_blocks(self):
         """Removes floating blocks from the building
-        A floating block is a block that is not supported by any other block"""
-        # TODO: there may be multiple floating blocks together, which are not being removed
-
-        # Remove blocks that are not supported by any other block
-        floating_block_kernel = [
-            [[0, 0, 0], [0, -1, 0], [0, 0, 0]],
-            [[0, -1, 0], [-1, 1, -1], [0, -1, 0]],
-            [[0, 0, 0], [0, -1, 0], [0, 0, 0]],
-        ]
-        matching_positions = self.apply_kernel(floating_block_kernel)
-        block_count = len(self.export_building())
-
-        for c in matching_positions:
-            if block_count <= 1:
-                break
-            if c[0][0] == 0:
-                continue  # allow floating blocks on the ground floor
-            block_count -= 1
-            self.grid[c[0][0]][c[0][1]][c[0][2]] = None
-            self.pixel_grid[c[0][0], c[0][1], c[0][2]] = -1
+        A floating block is a block that is not connected to the ground floor through other blocks,
+        all floating blocks are removed at once, including clusters of them"""
+        solid = self.pixel_grid == 1
+        ground = np.zeros_like(solid)
+        ground[0] = True
+
+        # The ground floor is never empty, so the building is never removed entirely
+        floating = solid & ~labeling.flood_fill(solid, ground)
+
+        for y, x, z in np.argwhere(floating).tolist():
+            if self.building_grid is not None:
+                self.building_grid.remove(self.grid[y][x][z])
+            self.grid[y][x][z] = None
+        self.pixel_grid[floating] = -1
 
     def create_windows(self, window_styles, window_quantifiers):
         """Creates windows in the building
@@ -229,77 +177,56 @@ class PostProcess:
         :return: matches found in the building grid
         :rtype: tuple((y, x, z), rotation)
         """
+        return self.apply_rotated_filters(style_registry.rotate_filter(filter_matrix))
 
-        def rotate_filter(filter_matrix, rotation):
-            # Rotate the filter matrix according to the rotation value (0, 90, 180, 270 degrees)
-            new_filter = []
-            for f in filter_matrix:
-                if rotation == 0:  # 0 degrees, no rotation
-                    new_filter.append(f)
-                elif rotation == 1:  # 90 degrees
-                    new_filter.append([list(row) for row in zip(*f[::-1])])
-                elif rotation == 2:  # 180 degrees
-                    new_filter.append([row[::-1] for row in f[::-1]])
-                elif rotation == 3:  # 270 degrees
-                    new_filter.append([list(row) for row in zip(*f)][::-1])
-            return new_filter
-
-        if not isinstance(filter_matrix[0][0], list):
-            filter_matrix = [filter_matrix]
-
-        filter_height = len(filter_matrix)
-        filter_depth = len(filter_matrix[0])
-        filter_width = len(filter_matrix[0][0])
-
-        # Assume the filter dimensions are odd sizes
-        height_offset = filter_height // 2
-        depth_offset = filter_depth // 2
-        width_offset = filter_width // 2
-
-        filtered_values = []
+    def apply_rotated_filters(self, rotated_filters):
+        """Applies a filter, already rotated by style_registry.rotate_filter, to the building grid
+        Every position is evaluated at once, only the first matching orientation is kept
 
-        for y in range(self.size_y):
-            for x in range(self.size_x):
-                for z in range(self.size_z):
-                    for orientation in range(4):
-                        rotated_filter = rotate_filter(filter_matrix, orientation)
-                        applies = True
-                        for fh in range(filter_height):
-                            for fd in range(filter_depth):
-                                for fw in range(filter_width):
-                                    ny, nx, nz = (
-                                        y + fh - height_offset,
-                                        x + fw - width_offset,
-                                        z + fd - depth_offset,
-                                    )
-                                    # Check bounds
-                                    if (
-                                        0 <= ny < self.size_y
-                                        and 0 <= nx < self.size_x
-                                        and 0 <= nz < self.size_z
-                                    ):
-                                        value = self.pixel_grid[ny][nx][nz]
-                                    else:
-                                        value = (
-                                            -1
-                                        )  # Outside bounds, treat as empty space
-
-                                    if (
-                                        rotated_filter[fh][fd][fw] != 0
-                                        and rotated_filter[fh][fd][fw] != value
-                                    ):
-                                        applies = False
-                                        break
-                                if not applies:
-                                    break
-                            if not applies:
-                                break
-
-                        if applies:
-                            filtered_values.append(((y, x, z), orientation))
-                            break  # only first orientation matches
-
-        return filtered_values
+        :param rotated_filters: filter in each of the four orientations
+        :type rotated_filters: tuple(np.ndarray)
+        :return: matches found in the building grid
+        :rtype: list((y, x, z), rotation)
+        """
+        shape = (self.size_y, self.size_x, self.size_z)
+
+        # Pad once for every orientation, everything outside the grid is empty space
+        pad_y = max(f.shape[0] for f in rotated_filters)
+        pad_xz = max(max(f.shape[1], f.shape[2]) for f in rotated_filters)
+        padded = np.pad(
+            self.pixel_grid,
+            ((pad_y, pad_y), (pad_xz, pad_xz), (pad_xz, pad_xz)),
+            mode="constant",
+            constant_values=-1,
+        )
+
+        matched = np.zeros(shape, dtype=bool)
+        orientations = np.zeros(shape, dtype=int)
+        for orientation, rotated_filter in enumerate(rotated_filters):
+            start = (
+                pad_y - rotated_filter.shape[0] // 2,
+                pad_xz - rotated_filter.shape[1] // 2,
+                pad_xz - rotated_filter.shape[2] // 2,
+            )
+            applies = ~matched
+            for fy, fx, fz in np.argwhere(rotated_filter != 0):
+                if not applies.any():
+                    break
+                window = padded[
+                    start[0] + fy : start[0] + fy + shape[0],
+                    start[1] + fx : start[1] + fx + shape[1],
+                    start[2] + fz : start[2] + fz + shape[2],
+                ]
+                applies &= window == rotated_filter[fy, fx, fz]
+
+            orientations[applies] = orientation
+            matched |= applies
+
+        positions = np.argwhere(matched)
+        return [
+            (tuple(p), o)
+            for p, o in zip(positions.tolist(), orientations[matched].tolist())
+        ]
 
     def remove_impossible_add_ons(self):
         for y in range(self.size_y):
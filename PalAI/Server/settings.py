@@ -0,0 +1,130 @@
+import functools
+import os
+from configparser import NoOptionError, NoSectionError, RawConfigParser
+from types import MappingProxyType
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.abspath(os.path.join(SERVER_DIR, "..", ".."))
+
+_BOOLEAN_STATES = RawConfigParser.BOOLEAN_STATES
+_MISSING = object()
+
+
+def resource_path(*parts) -> str:
+    """Absolute path of a data file shipped with the server, such as 'styles.json' or 'Blocks/Cube_Block.obj'
+
+    :rtype: str
+    """
+    return os.path.join(SERVER_DIR, *parts)
+
+
+class Settings:
+    def __init__(self, sections, config_path=""):
+        """Read-only configuration, parsed once per process and shared by every request
+        The getters follow RawConfigParser, so settings can be used wherever a config was
+
+        :param sections: options of every section
+        :type sections: dict(str, dict(str, str))
+        :param config_path: absolute path of the config file the settings were read from
+        :type config_path: str
+        """
+        self.config_path = config_path
+        self._sections = MappingProxyType(
+            {
+                section.lower(): MappingProxyType(
+                    {option.lower(): str(value) for option, value in options.items()}
+                )
+                for section, options in sections.items()
+            }
+        )
+
+    @staticmethod
+    def load(config_path) -> "Settings":
+        """Reads a config file, relative paths are resolved from the repository root
+
+        :rtype: Settings
+        """
+        config_path = os.path.join(ROOT_DIR, config_path)
+        config = RawConfigParser()
+        config.read(config_path)
+        return Settings(
+            {section: dict(config.items(section)) for section in config.sections()},
+            config_path,
+        )
+
+    def with_overrides(self, sections) -> "Settings":
+        """Returns a copy of the settings with some options replaced
+
+        :param sections: options to replace, by section
+        :type sections: dict(str, dict(str, str))
+        :rtype: Settings
+        """
+        merged = {section: dict(options) for section, options in self._sections.items()}
+        for section, options in sections.items():
+            merged.setdefault(section.lower(), {}).update(
+                {option.lower(): str(value) for option, value in options.items()}
+            )
+        return Settings(merged, self.config_path)
+
+    def has_section(self, section) -> bool:
+        return section.lower() in self._sections
+
+    def sections(self) -> list[str]:
+        return list(self._sections)
+
+    def get(self, section, option, *, fallback=_MISSING) -> str:
+        """Returns an option, raises the same errors as RawConfigParser if it is missing and no fallback is given
+
+        :rtype: str
+        """
+        options = self._sections.get(section.lower())
+        value = None if options is None else options.get(option.lower())
+        if value is None:
+            if fallback is not _MISSING:
+                return fallback
+            if options is None:
+                raise NoSectionError(section)
+            raise NoOptionError(option, section)
+        return value
+
+    def getint(self, section, option, *, fallback=_MISSING) -> int:
+        return self._convert(int, section, option, fallback)
+
+    def getfloat(self, section, option, *, fallback=_MISSING) -> float:
+        return self._convert(float, section, option, fallback)
+
+    def getboolean(self, section, option, *, fallback=_MISSING) -> bool:
+        return self._convert(_to_boolean, section, option, fallback)
+
+    def getpath(self, section, option, *, fallback=_MISSING) -> str:
+        """Returns an option holding a path, resolved from the repository root
+
+        :rtype: str
+        """
+        value = self.get(section, option, fallback=fallback)
+        return os.path.join(ROOT_DIR, value) if isinstance(value, str) else value
+
+    def _convert(self, convert, section, option, fallback):
+        value = self.get(section, option, fallback=None)
+        if value is None:
+            if fallback is not _MISSING:
+                return fallback
+            self.get(section, option)
+        return convert(value)
+
+
+def _to_boolean(value: str) -> bool:
+    if value.lower() not in _BOOLEAN_STATES:
+        raise ValueError(f"Not a boolean: {value}")
+    return _BOOLEAN_STATES[value.lower()]
+
+
+@functools.cache
+def get_settings(config_path=None) -> Settings:
+    """Returns the settings of the process, the config path defaults to the CONFIG_PATH environment variable
+
+    :rtype: Settings
+    """
+    if config_path is None:
+        config_path = os.getenv("CONFIG_PATH", "config.ini")
+    return Settings.load(config_path)
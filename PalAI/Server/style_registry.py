@@ -0,0 +1,122 @@
+import json
+import os
+from dataclasses import dataclass
+from types import MappingProxyType
+
+import numpy as np
+
+# Compiled style sheets, shared by every PostProcess in the process and keyed by path
+_style_sheets = {}
+
+
+def rotate_filter(filter_matrix):
+    """Converts a filter into arrays for each of the four orientations (0, 90, 180, 270 degrees)
+
+    :param filter_matrix: filter as written in the style sheet, indexed (height, depth, width)
+    :type filter_matrix: list(list(int) or list(list(list(int))))
+    :return: rotated filters, indexed (y, x, z) like the building grid
+    :rtype: tuple(np.ndarray)
+    """
+    filter_array = np.array(filter_matrix, dtype=int)
+    if filter_array.ndim == 2:
+        filter_array = filter_array[np.newaxis]
+
+    rotated_filters = []
+    for rotation in range(4):
+        # Rotations are clockwise, depth is the z axis and width is the x axis
+        rotated = np.rot90(filter_array, -rotation, axes=(1, 2)).transpose(0, 2, 1)
+        rotated = np.ascontiguousarray(rotated)
+        rotated.flags.writeable = False
+        rotated_filters.append(rotated)
+    return tuple(rotated_filters)
+
+
+@dataclass(frozen=True)
+class StyleRule:
+    """A style rule ready to be applied
+
+    :param filters: filter in each of the four orientations
+    :param effects: (key, values) pairs, with the value already formatted for each orientation
+    """
+
+    filters: tuple
+    effects: tuple
+
+    @classmethod
+    def compile(cls, rule: dict):
+        effects = []
+        for effect in rule["effects"]:
+            values = []
+            for rotation in range(4):
+                value = effect["value"].format_map({"rotation": rotation})
+                values.append(int(value) if value.isdigit() else value)
+            effects.append((effect["key"], tuple(values)))
+        return cls(rotate_filter(rule["filter"]), tuple(effects))
+
+
+@dataclass(frozen=True)
+class Style:
+    name: str
+    description: str
+    rules: tuple
+
+
+@dataclass(frozen=True)
+class StyleSheet:
+    """Parsed and compiled style sheet
+
+    :param styles: styles indexed by their upper case name
+    :param mtime: modification time of the file when it was compiled
+    """
+
+    styles: dict
+    mtime: float
+
+    @classmethod
+    def compile(cls, path: str, mtime: float):
+        with open(path, "r") as fptr:
+            loaded = json.load(fptr)
+
+        styles = {}
+        for name, s in loaded["styles"].items():
+            rules = tuple(StyleRule.compile(r) for r in s["rules"])
+            styles[name.upper()] = Style(name, s["description"], rules)
+        return cls(MappingProxyType(styles), mtime)
+
+    def get_available_styles(self):
+        """Returns a formatted paragraph of available styles and their descriptions"""
+        styles = ""
+        for s in self.styles.values():
+            styles += f"{s.name}: {s.description}\n"
+        return styles
+
+    def get_styles_list(self):
+        return list(self.styles.keys())
+
+    def get_style(self, style):
+        """Returns the compiled style with the given name
+
+        :param style: name of the style, case insensitive
+        :type style: str
+        :raises ValueError: if the style does not exist
+        :rtype: Style
+        """
+        try:
+            return self.styles[style.upper()]
+        except KeyError:
+            raise ValueError(f"Style {style} not found")
+
+
+def get_style_sheet(path: str) -> StyleSheet:
+    """Returns the compiled style sheet, parsing it only on first use or after it has been modified
+
+    :param path: absolute path to the style sheet json
+    :type path: str
+    :rtype: StyleSheet
+    """
+    mtime = os.stat(path).st_mtime
+    style_sheet = _style_sheets.get(path)
+    if style_sheet is None or style_sheet.mtime != mtime:
+        style_sheet = StyleSheet.compile(path, mtime)
+        _style_sheets[path] = style_sheet
+    return style_sheet
@@ -1,8 +1,11 @@
-import os
+import functools
+import io
 
+import numpy as np
 from numpy import add
 
 from PalAI.Server.placeable import Placeable
+from PalAI.Server.settings import resource_path
 
 
 class ObjVisualizer:
@@ -22,9 +25,11 @@ class ObjVisualizer:
             # Add more block types here
         }
 
-    def __place_block(self, position, block_name, size, vertex_offset, rotation=0):
+    def __place_block(self, out, position, block_name, size, vertex_offset, rotation=0):
         """Places a block in the OBJ file
 
+        :param out: buffer the OBJ content of the block is written to
+        :type out: io.StringIO
         :param position: (x, y, z) position of the block
         :type position: tuple
         :param block_name: name of the block, matching the keys in self.block_obj_paths
@@ -35,65 +40,31 @@ class ObjVisualizer:
         :type vertex_offset: int
         :param rotation: rotation, in increments of 90 degrees along the y-axis
         :type rotation: int in the interval [0- 3]
-        :return: content of the OBJ file and the updated vertex offset
-        :rtype: tuple (content: str, vertex_offset: int)
+        :return: the updated vertex offset
+        :rtype: int
         """
-        obj_content = ""
-        path = os.path.join(os.path.dirname(__file__), self.block_obj_paths[block_name])
-        # Load the template OBJ for this block
-        with open(path) as file:
-            block_obj = file.read()
-
-        # Adjust the vertices based on position and size
-        for line in block_obj.splitlines():
-            if line.startswith("v "):  # Vertex definition
-                parts = line.split()
-                x, y, z = [float(parts[1]), float(parts[2]), float(parts[3])]
-
-                # Adjust for pivot (0.5, 0.5) before rotation
-                x -= 0.5
-                z -= 0.5
-
-                # Apply rotation
-                if rotation % 4 == 1:
-                    x, z = -z, x
-                elif rotation % 4 == 2:
-                    x, z = -x, -z
-                elif rotation % 4 == 3:
-                    x, z = z, -x
-
-                # Adjust back after rotation
-                x += 0.5
-                z += 0.5
-
-                # Now apply scaling and translation
-                x, y, z = [
-                    x * size + position[0],
-                    y * size + position[1],
-                    z * size + position[2],
+        mesh = _load_mesh(resource_path(self.block_obj_paths[block_name]))
+        vertices = mesh.transform(position, size, rotation).tolist()
+
+        # Lines are written in the order of the template
+        for kind, content in mesh.chunks:
+            if kind == "v":
+                out.write("".join(f"v {x} {y} {z}\n" for x, y, z in vertices[content]))
+            elif kind == "f":
+                indexes, suffixes, lengths = content
+                tokens = [
+                    f"{i}{suffix}"
+                    for i, suffix in zip((indexes + vertex_offset).tolist(), suffixes)
                 ]
-
-                obj_content += f"v {x} {y} {z}\n"
-            elif line.startswith(
-                "f "
-            ):  # Face definition, adjust with the current vertex offset
-                parts = line.split()[1:]
-                faces = []
-                for f in parts:
-                    face = f.split("/")
-                    face[0] = str(int(face[0]) + vertex_offset)
-                    faces.append("/".join(face))
-                obj_content += "f " + " ".join(faces) + "\n"
-            elif line.startswith("vt "):
-                obj_content += line + "\n"
-            elif line.startswith("vn "):
-                obj_content += line + "\n"
+                start = 0
+                for length in lengths:
+                    out.write("f " + " ".join(tokens[start : start + length]) + "\n")
+                    start += length
+            else:
+                out.write(content)
 
         # Update the vertex offset for the next block
-        vertex_offset += sum(
-            1 for line in block_obj.splitlines() if line.startswith("v ")
-        )
-        return (obj_content, vertex_offset)
+        return vertex_offset + len(mesh.vertices)
 
     def generate_obj(self, api_response):
         """Takes an API response and generates an OBJ file representation.
@@ -104,7 +75,7 @@ class ObjVisualizer:
         :rtype: str
         """
 
-        obj_content = ""
+        obj_content = io.StringIO()
         vertex_offset = 0  # Initialize vertex offset
 
         for block in api_response:
@@ -139,27 +110,111 @@ class ObjVisualizer:
                     0.5 + float(pos[1]),
                     0.35 + float(pos[2]) + diff[1] * 0.5,
                 )
-                placed_block = self.__place_block(
-                    add_on_position, "CUBE", add_on_size, vertex_offset
+                vertex_offset = self.__place_block(
+                    obj_content, add_on_position, "CUBE", add_on_size, vertex_offset
                 )
-                obj_content += placed_block[0]
-                vertex_offset = placed_block[1]
                 if add_on["type"] == "DOOR":
                     add_on_position = (
                         add_on_position[0],
                         add_on_position[1] - 0.4,
                         add_on_position[2],
                     )
-                    placed_block = self.__place_block(
-                        add_on_position, "CUBE", add_on_size, vertex_offset
+                    vertex_offset = self.__place_block(
+                        obj_content, add_on_position, "CUBE", add_on_size, vertex_offset
                     )
-                    obj_content += placed_block[0]
-                    vertex_offset = placed_block[1]
 
-            placed_block = self.__place_block(
-                position, block_name, size, vertex_offset, rotation
+            vertex_offset = self.__place_block(
+                obj_content, position, block_name, size, vertex_offset, rotation
             )
-            obj_content += placed_block[0]
-            vertex_offset = placed_block[1]
 
-        return obj_content
+        return obj_content.getvalue()
+
+
+class ObjMesh:
+    def __init__(self, obj: str):
+        """Template mesh of a block, parsed once and placed many times
+
+        :param obj: content of the OBJ file, only vertices, texture coordinates, normals and faces are kept
+        :type obj: str
+        """
+        vertices = []
+        # Consecutive lines of the same kind: a slice of vertices, faces, or text kept as is
+        self.chunks = []
+        faces = []
+        for line in obj.splitlines():
+            if line.startswith("v "):
+                parts = line.split()
+                vertices.append([float(parts[1]), float(parts[2]), float(parts[3])])
+                kind = "v"
+            elif line.startswith("f "):
+                faces.append(line.split()[1:])
+                kind = "f"
+            elif line.startswith("vt ") or line.startswith("vn "):
+                kind = "text"
+            else:
+                continue
+
+            if not self.chunks or self.chunks[-1][0] != kind:
+                self.chunks.append([kind, []])
+            if kind == "v":
+                self.chunks[-1][1].append(len(vertices) - 1)
+            elif kind == "f":
+                self.chunks[-1][1].append(faces[-1])
+            else:
+                self.chunks[-1][1].append(line + "\n")
+
+        self.vertices = np.array(vertices, dtype=float).reshape(-1, 3)
+        for chunk in self.chunks:
+            kind, content = chunk
+            if kind == "v":
+                chunk[1] = slice(content[0], content[-1] + 1)
+            elif kind == "f":
+                # Only the vertex index of each face corner is offset, texture and normal indexes are kept
+                corners = [c.split("/", 1) for face in content for c in face]
+                chunk[1] = (
+                    np.array([int(c[0]) for c in corners], dtype=np.int64),
+                    ["/" + c[1] if len(c) > 1 else "" for c in corners],
+                    [len(face) for face in content],
+                )
+            else:
+                chunk[1] = "".join(content)
+        self.chunks = [tuple(chunk) for chunk in self.chunks]
+
+    def transform(self, position, size, rotation=0) -> np.ndarray:
+        """Vertices rotated around the center of the block, then scaled and moved to a position
+
+        :param position: (x, y, z) position of the block
+        :type position: tuple
+        :param rotation: rotation, in increments of 90 degrees along the y-axis
+        :type rotation: int
+        :rtype: np.ndarray
+        """
+        # Adjust for pivot (0.5, 0.5) before rotation
+        x = self.vertices[:, 0] - 0.5
+        y = self.vertices[:, 1]
+        z = self.vertices[:, 2] - 0.5
+
+        # Apply rotation
+        if rotation % 4 == 1:
+            x, z = -z, x
+        elif rotation % 4 == 2:
+            x, z = -x, -z
+        elif rotation % 4 == 3:
+            x, z = z, -x
+
+        # Adjust back after rotation
+        x = x + 0.5
+        z = z + 0.5
+
+        # Now apply scaling and translation
+        return np.stack(
+            (x * size + position[0], y * size + position[1], z * size + position[2]),
+            axis=-1,
+        )
+
+
+@functools.cache
+def _load_mesh(path) -> ObjMesh:
+    """Returns the template mesh of an OBJ file, parsed once per process"""
+    with open(path) as file:
+        return ObjMesh(file.read())
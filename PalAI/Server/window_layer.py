@@ -1,5 +1,6 @@
 import random
 
+from PalAI.Server.building_grid import BuildingGrid
 from PalAI.Server.placeable import Placeable
 
 directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
@@ -10,6 +11,7 @@ def create_windows(
     window_styles: list[str],
     window_quantifiers: list[float],
     rng: random.Random,
+    building_grid: BuildingGrid = None,
 ) -> list[Placeable]:
     """Creates windows in the building
 
@@ -19,41 +21,19 @@ def create_windows(
     :type window_styles: list(str)
     :param window_quantifiers: ration of windows to be created (vs total possibilities)
     :type window_quantifiers: list(float) (0 to 1)
+    :param building_grid: index of the building, created from the building if None
+    :type building_grid: BuildingGrid
     :return: None
     """
+    if building_grid is None:
+        building_grid = BuildingGrid(building)
 
-    offset_x = min(building, key=lambda b: b.x).x
-    offset_y = min(building, key=lambda b: b.y).y
-    offset_z = min(building, key=lambda b: b.z).z
-    size_x = max(building, key=lambda b: b.x).x + 1 - offset_x
-    size_y = max(building, key=lambda b: b.y).y + 1 - offset_y
-    size_z = max(building, key=lambda b: b.z).z + 1 - offset_z
-
-    # Grid is indexed (y, x, z) because most transformations happen on a slice of the y axis
-    grid = [
-        [[None for _ in range(size_z)] for _ in range(size_x)] for _ in range(size_y)
-    ]
-
-    for b in building:
-        grid[b.y - offset_y][b.x - offset_x][b.z - offset_z] = b
+    (_, offset_y, _), (_, max_y, _) = building_grid.bounds()
 
     # stores only the blocks that can have windows, organized by layer, then by direction of window
-    layered_candidates = [[[] for _ in range(4)] for _ in range(size_y)]
-    for y in range(size_y):
-        for x in range(size_x):
-            for z in range(size_z):
-                cell = grid[y][x][z]
-                if cell is not None and cell.block_type == "CUBE":
-                    for i, d in enumerate(directions):
-                        # a block can have a window if the block in the direction of the window is None
-                        if (
-                            x + d[0] < 0
-                            or x + d[0] >= size_x
-                            or z + d[1] < 0
-                            or z + d[1] >= size_z
-                            or grid[y][x + d[0]][z + d[1]] is None
-                        ):
-                            layered_candidates[y][i].append(cell)
+    # a block can have a window if the block in the direction of the window is empty
+    facades = building_grid.facades()
+    layered_candidates = [facades.candidates(y) for y in range(offset_y, max_y + 1)]
 
     for i, w in enumerate(window_styles):
         match w:
@@ -122,18 +102,13 @@ def _create_symmetric_windows(
 ):
     limit = int(sum([len(i) for i in layered_candidates]) * window_quantifier)
     windows_added = 0
-    for i, side in enumerate(layered_candidates):
+    sides = [_SideIndex(side, d) for side, d in zip(layered_candidates, directions)]
+    for i, side in enumerate(sides):
         d = directions[i]
+        opposite = sides[(i + 2) % 4]
         for b in side:
-            # check the side opposite to the window
-            axis = 0 if d[0] != 0 else 1
-            if axis == 0:
-                cond = lambda x: x.z == b.z
-            else:
-                cond = lambda x: x.x == b.x
-            opposite_candidates = [
-                c for c in layered_candidates[(i + 2) % 4] if cond(c)
-            ]
+            # the opposite window must be on the same row or column
+            opposite_candidates = opposite.row(side.key(b))
 
             if len(opposite_candidates) == 0:
                 continue
@@ -147,10 +122,50 @@ def _create_symmetric_windows(
                 # also add opposite window
                 win = Placeable("WINDOW", o.x - d[0], o.y, o.z - d[1])
                 o.tags.append(win)
-                layered_candidates[(i + 2) % 4].remove(o)
+                opposite.remove(o)
                 side.remove(b)
                 windows_added += 2
 
                 if windows_added >= limit:
                     return
     return
+
+
+class _SideIndex:
+    def __init__(self, candidates: list[Placeable], direction: tuple[int, int]):
+        """Window candidates of one side of a layer, indexed by the row or column they face
+
+        :param candidates: blocks that can have a window on this side
+        :type candidates: list(Placeable)
+        :param direction: direction the windows face
+        :type direction: tuple(int, int)
+        """
+        self.candidates = candidates
+        # Sides facing along x are matched by their z coordinate and vice versa
+        self.axis = "z" if direction[0] != 0 else "x"
+        self._rows: dict[int, list[Placeable]] = {}
+        self._positions: dict[Placeable, int] = {}
+        for c in candidates:
+            row = self._rows.setdefault(self.key(c), [])
+            self._positions[c] = len(row)
+            row.append(c)
+
+    def key(self, block: Placeable) -> int:
+        return getattr(block, self.axis)
+
+    def row(self, key: int) -> list[Placeable]:
+        """Remaining candidates of a row or column"""
+        return self._rows.get(key, [])
+
+    def remove(self, block: Placeable):
+        """Removes a candidate in constant time, the last candidate of its row takes its place"""
+        row = self._rows[self.key(block)]
+        i = self._positions.pop(block)
+        last = row.pop()
+        if last is not block:
+            row[i] = last
+            self._positions[last] = i
+
+    def __iter__(self):
+        # Candidates are visited in their original order, removed ones are skipped
+        return (c for c in self.candidates if c in self._positions)
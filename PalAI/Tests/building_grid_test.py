@@ -0,0 +1,88 @@
+import unittest
+
+from PalAI.Server.building_grid import BuildingGrid
+from PalAI.Server.placeable import Placeable
+from PalAI.Server.post_process import PostProcess
+
+
+class BuildingGridTest(unittest.TestCase):
+    def test_lookup_and_neighbors(self):
+        blocks = [Placeable("CUBE", 1, 0, 0), Placeable("CUBE", 0, 0, 0), Placeable("CUBE", 0, 1, 0)]
+        grid = BuildingGrid(blocks)
+
+        self.assertIs(grid.get(0, 1, 0), blocks[2])
+        self.assertIsNone(grid.get(0, 2, 0))
+        self.assertEqual(grid.neighbors(0, 0, 0), [None, blocks[0], None, None])
+        self.assertEqual(grid.layer(0), [blocks[1], blocks[0]])
+        self.assertEqual(grid.layers(), [0, 1])
+
+    def test_bounds_follow_changes(self):
+        blocks = [Placeable("CUBE", 0, 0, 0), Placeable("CUBE", 3, 2, -1)]
+        grid = BuildingGrid(blocks)
+        self.assertEqual(grid.bounds(), ((0, 0, -1), (3, 2, 0)))
+
+        grid.remove(blocks[1])
+        grid.add(Placeable("CUBE", -2, 0, 0))
+        self.assertEqual(grid.bounds(), ((-2, 0, 0), (0, 0, 0)))
+        self.assertEqual(grid.layers(), [0])
+
+    def test_layer_bounds_follow_changes(self):
+        blocks = [Placeable("CUBE", 0, 0, 0), Placeable("CUBE", 1, 0, 2), Placeable("CUBE", 5, 1, -3)]
+        grid = BuildingGrid(blocks)
+        self.assertEqual(grid.layer_bounds(0), ((0, 0), (1, 2)))
+
+        grid.add(Placeable("CUBE", -1, 0, 1))
+        grid.remove(blocks[1])
+        self.assertEqual(grid.layer_bounds(0), ((-1, 0), (0, 1)))
+        self.assertRaises(ValueError, grid.layer_bounds, 2)
+
+    def test_add_without_replace(self):
+        grid = BuildingGrid([Placeable("CUBE", 0, 0, 0)])
+        self.assertFalse(grid.add(Placeable("DIAGONAL", 0, 0, 0), replace=False))
+        self.assertEqual(grid.get(0, 0, 0).block_type, "CUBE")
+        self.assertEqual(len(grid), 1)
+
+    def test_stays_consistent_with_post_process(self):
+        building = [Placeable("CUBE", x, y, z) for x in range(3) for z in range(3) for y in range(3)]
+        building.remove(next(b for b in building if (b.x, b.y, b.z) == (1, 1, 1)))
+        building.append(Placeable("CUBE", 0, 5, 0))
+        grid = BuildingGrid(building)
+
+        pp = PostProcess()
+        pp.import_building(building, grid)
+        pp.remove_floating_blocks()
+        pp.fill_empty_spaces()
+
+        exported = pp.export_building()
+        self.assertEqual(sorted((b.x, b.y, b.z) for b in grid), sorted((b.x, b.y, b.z) for b in exported))
+
+    def test_facades(self):
+        # L shaped ground floor with a diagonal on (1, 1) and a cube on top of (0, 0)
+        blocks = [
+            Placeable("DIAGONAL", 1, 0, 1),
+            Placeable("CUBE", 0, 0, 0),
+            Placeable("CUBE", 1, 0, 0),
+            Placeable("CUBE", 0, 1, 0),
+        ]
+        grid = BuildingGrid(blocks)
+        facades = grid.facades()
+
+        self.assertEqual(facades.exposed.shape, (2, 2, 2, 4))
+        self.assertEqual(facades.layer(0), grid.layer(0))
+        for y in (0, 1):
+            for d, (dx, dz) in enumerate(((0, 1), (1, 0), (0, -1), (-1, 0))):
+                expected = [
+                    b for b in grid.layer(y) if grid.get(b.x + dx, y, b.z + dz) is None
+                ]
+                self.assertEqual(facades.candidates(y, cubes_only=False)[d], expected)
+                self.assertEqual(
+                    facades.candidates(y)[d], [b for b in expected if b.block_type == "CUBE"]
+                )
+        self.assertEqual(facades.candidates(5), [[], [], [], []])
+
+        self.assertIs(grid.facades(), facades)
+        grid.remove(blocks[0])
+        self.assertEqual(grid.facades().candidates(0)[0], [blocks[1], blocks[2]])
+
+if __name__ == "__main__":
+    unittest.main()
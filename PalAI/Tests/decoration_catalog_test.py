@@ -0,0 +1,43 @@
+import unittest
+
+from PalAI.Server.decoration_catalog import DecorationCatalog, get_decoration_catalog
+
+DECORATIONS = [
+    {"name": "Sofa", "adjacency": ["WALL", "", "", ""], "limit": 2, "room": "living"},
+    {"name": "Plant", "asset_name": ["Plant 1", "Plant 2"]},
+]
+ROOMS = [{"name": "living", "coverage": 0.5}]
+
+
+class DecorationCatalogTest(unittest.TestCase):
+    def test_rotations_are_expanded(self):
+        catalog = DecorationCatalog(DECORATIONS, ROOMS)
+        sofas = [d for d in catalog.decorations if d["name"] == "Sofa"]
+        self.assertEqual([d["rotation"] for d in sofas], [0, 1, 2, 3])
+        self.assertEqual(sofas[1]["adjacency"], ["", "WALL", "", ""])
+        # Symmetric decorations are not rotated, EMPTY is always last
+        self.assertEqual(
+            [d["name"] for d in catalog.decorations],
+            ["Sofa", "Plant", "Sofa", "Sofa", "Sofa", "EMPTY"],
+        )
+        self.assertEqual(catalog.room_masks["living"], 0b111101)
+        self.assertEqual(catalog.decoration_name("Plant 2"), "Plant")
+
+    def test_catalog_is_read_only(self):
+        catalog = DecorationCatalog(DECORATIONS, ROOMS)
+        with self.assertRaises(TypeError):
+            catalog.decorations[0]["limit"] = 0
+        self.assertNotIn("rotation", DECORATIONS[0])
+
+    def test_filtered_catalogs_are_shared(self):
+        catalog = get_decoration_catalog(decorations=["Sofa", "Bed"])
+        self.assertIs(catalog, get_decoration_catalog(decorations=["Bed", "Sofa"]))
+        self.assertIs(get_decoration_catalog(), get_decoration_catalog(decorations=[]))
+        self.assertLess(len(catalog.decorations), len(get_decoration_catalog().decorations))
+        self.assertTrue(
+            all(d["name"] in ("Sofa", "Bed", "EMPTY") for d in catalog.decorations)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -44,6 +44,23 @@ class PostProcessTest(unittest.TestCase):
         decorations = decorator.decorate()
         self.assertGreater(len(decorations), 0)
 
+    def test_seeded_decorations_are_reproducible(self):
+        results = []
+        for _ in range(2):
+            decorator = Decorator(random.Random(7))
+            decorator.import_building(_get_square_building(12, (0, 0)))
+            results.append(decorator.decorate())
+        self.assertEqual(results[0], results[1])
+
+    def test_building_is_not_modified(self):
+        building = _get_square_building(8, (0, 0)) + _get_square_building(8, (0, 0), 1)
+        before = [b.to_json() for b in building]
+        decorator = Decorator(random.Random(3))
+        decorator.import_building(building)
+        decorator.decorate()
+        self.assertEqual([b.to_json() for b in building], before)
+        self.assertTrue(all(b in building for b in decorator.floor_list))
+
     def test_all_decorations_are_used_within_limits(self):
         used_decorations = set()
         total_decorations_count = 0
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from PalAI.Server.LLMClients.Examples.example_getter import ExampleStore, add_example
+from PalAI.Server.LLMClients.Examples.example_selector import ExampleIndex
+from PalAI.Server.LLMClients.gpt_client import GPTClient
+from PalAI.Server.LLMClients.token_accounting import count_tokens
+from PalAI.Server.settings import get_settings
+
+EXAMPLES = [
+    {"user": "I want a round tower", "assistant": "Layer 0: circle"},
+    {"user": "Create an L-shaped house", "assistant": "Layer 0: L shape"},
+    {"user": "I want a tall round skyscraper", "assistant": "Layer 0: circle\nLayer 1: circle"},
+    {"user": "Build a small cottage with a garden", "assistant": "Layer 0: 5x5 square"},
+]
+
+
+class ExampleSelectorTest(unittest.TestCase):
+    def test_selects_most_similar(self):
+        index = ExampleIndex(EXAMPLES)
+        selected = index.select("a round skyscraper", top_k=2)
+        # Ranked by similarity, returned in file order
+        self.assertEqual(selected, [EXAMPLES[0], EXAMPLES[2]])
+
+    def test_respects_token_budget(self):
+        index = ExampleIndex(EXAMPLES)
+        budget = count_tokens(EXAMPLES[0]["user"]) + count_tokens(EXAMPLES[0]["assistant"])
+        selected = index.select("a round skyscraper", top_k=4, token_budget=budget)
+        self.assertEqual(selected, [EXAMPLES[0]])
+
+    def test_added_examples_are_selected(self):
+        index = ExampleIndex(EXAMPLES)
+        index.add("Make a pyramid", "Layer 0: 7x7 square\nLayer 1: 5x5 square")
+        self.assertEqual(index.select("an egyptian pyramid", top_k=1)[0]["user"], "Make a pyramid")
+
+    def test_store_reloads_added_example(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "examples.json")
+            with open(path, "w") as f:
+                json.dump({"architect_examples": {"Example1": EXAMPLES[1]}}, f)
+
+            store = ExampleStore(path, check_interval=0.0, top_k=1)
+            self.assertEqual(len(store.get_index("architect_examples")), 1)
+
+            add_example("architect_examples", "Make a pyramid", "Layer 0: 7x7 square", path)
+            os.utime(path, (0, 0))
+            messages = store.get_messages("architect_examples", "a pyramid", select=True)
+            self.assertEqual(messages[0]["content"], "Make a pyramid")
+            self.assertEqual(len(store.get_prefix("architect_examples")), 4)
+
+    def _get_client(self, **openai):
+        settings = get_settings().with_overrides(
+            {"openai": {"api_key": "test", "model_name": "gpt-3.5-turbo", **openai}}
+        )
+        with mock.patch("PalAI.Server.LLMClients.llm_client.get_settings", return_value=settings):
+            return GPTClient({})
+
+    def _get_sent_messages(self, client):
+        messages = [
+            {"role": "user", "content": EXAMPLES[0]["user"]},
+            {"role": "assistant", "content": EXAMPLES[0]["assistant"]},
+            {"role": "user", "content": "a round tower"},
+        ]
+        chain, inputs = client._get_chain("system", "a round tower", "architect", messages)
+        return [(m.type, m.content) for m in chain.first.invoke(inputs).to_messages()]
+
+    def test_examples_are_not_sent_by_default(self):
+        self.assertEqual(
+            self._get_sent_messages(self._get_client()),
+            [("system", "system"), ("human", "a round tower")],
+        )
+
+    def test_selected_examples_are_sent(self):
+        self.assertEqual(
+            self._get_sent_messages(self._get_client(send_examples="true")),
+            [
+                ("system", "system"),
+                ("human", EXAMPLES[0]["user"]),
+                ("ai", EXAMPLES[0]["assistant"]),
+                ("human", "a round tower"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
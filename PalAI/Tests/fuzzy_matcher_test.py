@@ -0,0 +1,55 @@
+import random
+import unittest
+from unittest import mock
+
+import Levenshtein
+from PalAI.Server.fuzzy_matcher import FuzzyMatcher, get_matcher, total_stats
+
+
+class FuzzyMatcherTest(unittest.TestCase):
+    def test_matches_full_sort(self):
+        candidates = ["5x5 square", "small cross", "single cube", "3x3 square", "L shape"]
+        matcher = FuzzyMatcher(candidates)
+        rng = random.Random(0)
+        alphabet = "abcdefghijklmnopqrstuvwxyz 0123456789"
+        for _ in range(500):
+            response = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12)))
+            expected = sorted(candidates, key=lambda x: Levenshtein.distance(x, response))[0]
+            self.assertEqual(matcher.match(response), expected)
+
+    def test_case_folded_match(self):
+        matcher = FuzzyMatcher(["PLASTIC RED", "DARK RED"])
+        self.assertEqual(matcher.match("plastic red"), "PLASTIC RED")
+        self.assertEqual(matcher.stats()["exact_hits"], 1)
+
+    def test_counts_cache_hits(self):
+        matcher = FuzzyMatcher(["few", "some", "many"], cache_size=1)
+        matcher.match("a lot")
+        matcher.match("a lot")
+        matcher.match("barely")
+        matcher.match("a lot")
+        self.assertEqual(matcher.cache_hits, 1)
+        self.assertEqual(matcher.misses, 3)
+
+    def test_only_misses_are_reported(self):
+        matcher = FuzzyMatcher(["few", "some", "many"])
+        with mock.patch("sentry_sdk.metrics.incr") as incr:
+            matcher.match("few")
+            matcher.match("MANY")
+            matcher.match("a lot")
+            matcher.match("a lot")
+        self.assertEqual(incr.call_count, 1)
+
+    def test_matcher_is_shared(self):
+        self.assertIs(get_matcher(("a", "b")), get_matcher(("a", "b")))
+
+    def test_reports_shared_matchers(self):
+        before = total_stats()
+        get_matcher(("stats a", "stats b")).match("stats c")
+        after = total_stats()
+        self.assertEqual(after["misses"], before["misses"] + 1)
+        self.assertGreaterEqual(after["matchers"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import random
+import unittest
+
+from PalAI.Server import gardener
+from PalAI.Server.building_grid import BuildingGrid
+from PalAI.Server.placeable import Placeable
+
+
+class GardenerTest(unittest.TestCase):
+    def _get_house(self, size):
+        building = [Placeable("CUBE", x, 0, z) for x in range(size) for z in range(size)]
+        doors = {(0, 1): building[size - 1], (1, 0): building[-size]}
+        for (dx, dz), b in doors.items():
+            b.tags.append(Placeable("DOOR", b.x + dx, 0, b.z + dz))
+        return building
+
+    def test_keeps_corridor_in_front_of_doors(self):
+        building = self._get_house(5)
+        for seed in range(20):
+            garden = gardener.create_gardens(building, random.Random(seed))
+            occupied = {(g.x, g.z) for g in garden}
+            for b in building:
+                for t in b.tags:
+                    d = (t.x - b.x, t.z - b.z)
+                    corridor = {(t.x + d[0] * k, t.z + d[1] * k) for k in range(3)}
+                    self.assertFalse(occupied & corridor)
+
+    def test_garden_is_next_to_the_house(self):
+        garden = gardener.create_gardens(self._get_house(5), random.Random(0))
+        self.assertGreater(len(garden), 0)
+        self.assertTrue(all(g.y == 0 for g in garden))
+        self.assertTrue(all(not (0 <= g.x < 5 and 0 <= g.z < 5) for g in garden))
+
+    def test_shared_grid_gives_the_same_garden(self):
+        building = self._get_house(4)
+        building.append(Placeable("CUBE", 7, 1, 7))
+        for seed in range(10):
+            expected = gardener.create_gardens(building, random.Random(seed))
+            garden = gardener.create_gardens(building, random.Random(seed), BuildingGrid(building))
+            self.assertEqual([g.to_json() for g in garden], [g.to_json() for g in expected])
+            # Only the ground floor decides where the garden goes
+            self.assertTrue(all(g.x <= 8 and g.z <= 8 for g in garden))
+
+if __name__ == "__main__":
+    unittest.main()
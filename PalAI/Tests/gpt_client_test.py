@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+from contextlib import aclosing
+from unittest import mock
+
+from PalAI.Server.LLMClients.gpt_client import GPTClient
+from PalAI.Server.LLMClients.llm_pool import LLMPool
+from PalAI.Server.settings import get_settings
+
+
+class ChunkChain:
+    """Chain that streams a fixed response without calling any model"""
+
+    async def astream(self, inputs):
+        for chunk in ("Layer 0: ", "5x5 Square\n", "Layer 1: ", "5x5 Square\n"):
+            yield chunk
+
+
+class GPTClientTest(unittest.TestCase):
+    def setUp(self):
+        settings = get_settings().with_overrides(
+            {"openai": {"api_key": "test", "model_name": "gpt-3.5-turbo"}}
+        )
+        with mock.patch("PalAI.Server.LLMClients.llm_client.get_settings", return_value=settings):
+            self.client = GPTClient({"architect": "system {presets}"})
+        self.client._get_chain = lambda *args: (
+            ChunkChain(),
+            {"system_message": "system", "examples": [], "prompt": "a house"},
+        )
+
+    def test_stream_releases_slot_when_closed_early(self):
+        async def read_first_chunk():
+            async with aclosing(self.client.stream_agent_response("architect", "a house")) as stream:
+                async for chunk in stream:
+                    self.assertEqual(self.client.pool.in_flight, 1)
+                    break
+            # Released before the event loop gets a chance to finalize the generators
+            return chunk, self.client.pool.in_flight
+
+        self.assertEqual(asyncio.run(read_first_chunk()), ("Layer 0: ", 0))
+
+    def test_stream_records_usage(self):
+        async def read_all():
+            return "".join([c async for c in self.client.stream_agent_response("architect", "a house")])
+
+        self.assertEqual(asyncio.run(read_all()), "Layer 0: 5x5 Square\nLayer 1: 5x5 Square\n")
+        self.assertEqual(self.client.pool.in_flight, 0)
+        self.assertEqual(self.client.usage.totals()["requests"], 1)
+
+    def test_pool_connections_follow_the_event_loop(self):
+        pool = LLMPool()
+
+        async def get_connections():
+            client = pool.get_http_client()
+            model = pool.get_model("gpt-3.5-turbo", 0.1, 100, "test")
+            self.assertIs(pool.get_http_client(), client)
+            async with pool.slot():
+                pass
+            return client, model
+
+        first_client, first_model = asyncio.run(get_connections())
+        second_client, second_model = asyncio.run(get_connections())
+        self.assertIsNot(first_client, second_client)
+        self.assertIsNot(first_model, second_model)
+        self.assertEqual(pool.stats()["models"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+
+from PalAI.Server.settings import resource_path
+
+
+def _rotate_filter(filter_matrix, rotation):
+    # Rotate the filter matrix according to the rotation value (0, 90, 180, 270 degrees)
+    new_filter = []
+    for f in filter_matrix:
+        if rotation == 0:  # 0 degrees, no rotation
+            new_filter.append(f)
+        elif rotation == 1:  # 90 degrees
+            new_filter.append([list(row) for row in zip(*f[::-1])])
+        elif rotation == 2:  # 180 degrees
+            new_filter.append([row[::-1] for row in f[::-1]])
+        elif rotation == 3:  # 270 degrees
+            new_filter.append([list(row) for row in zip(*f)][::-1])
+    return new_filter
+
+
+def apply_kernel(pixel_grid, filter_matrix):
+    """Pure python kernel matcher that PostProcess.apply_kernel used to run
+    Used by the equivalence tests and by PalAI/Tools/benchmark_kernel.py
+
+    :param pixel_grid: grid indexed (y, x, z), 1 for blocks and -1 for empty spaces
+    :type pixel_grid: np.ndarray
+    :param filter_matrix: filter to be applied
+    :type filter_matrix: list(list(int) or list(list(list(int))))
+    :return: matches found in the grid
+    :rtype: list((y, x, z), rotation)
+    """
+    if not isinstance(filter_matrix[0][0], list):
+        filter_matrix = [filter_matrix]
+
+    size_y, size_x, size_z = pixel_grid.shape
+    filter_height = len(filter_matrix)
+    filter_depth = len(filter_matrix[0])
+    filter_width = len(filter_matrix[0][0])
+
+    height_offset = filter_height // 2
+    depth_offset = filter_depth // 2
+    width_offset = filter_width // 2
+
+    filtered_values = []
+    for y in range(size_y):
+        for x in range(size_x):
+            for z in range(size_z):
+                for orientation in range(4):
+                    rotated_filter = _rotate_filter(filter_matrix, orientation)
+                    applies = all(
+                        rotated_filter[fh][fd][fw] == 0
+                        or rotated_filter[fh][fd][fw] == _value_at(
+                            pixel_grid,
+                            y + fh - height_offset,
+                            x + fw - width_offset,
+                            z + fd - depth_offset,
+                        )
+                        for fh in range(filter_height)
+                        for fd in range(filter_depth)
+                        for fw in range(filter_width)
+                    )
+                    if applies:
+                        filtered_values.append(((y, x, z), orientation))
+                        break  # only first orientation matches
+
+    return filtered_values
+
+
+def _value_at(pixel_grid, y, x, z):
+    size_y, size_x, size_z = pixel_grid.shape
+    if 0 <= y < size_y and 0 <= x < size_x and 0 <= z < size_z:
+        return pixel_grid[y][x][z]
+    return -1  # Outside bounds, treat as empty space
+
+
+def get_filters():
+    """Every filter used by the style sheet and the floating block removal"""
+    with open(resource_path("styles.json"), "r") as fptr:
+        styles = json.load(fptr)["styles"]
+
+    filters = [rule["filter"] for s in styles.values() for rule in s["rules"]]
+    filters.append(
+        [
+            [[0, 0, 0], [0, -1, 0], [0, 0, 0]],
+            [[0, -1, 0], [-1, 1, -1], [0, -1, 0]],
+            [[0, 0, 0], [0, -1, 0], [0, 0, 0]],
+        ]
+    )
+    return filters
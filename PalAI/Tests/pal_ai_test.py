@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import unittest
+
+import yaml
+
+from PalAI.Server.pal_ai import PalAI
+from PalAI.Server.settings import get_settings
+from PalAI.Tools.LLMClients.mock_client import MockClient
+
+
+class StreamingClient(MockClient):
+    """Mock client that streams its responses one character at a time"""
+
+    async def stream_agent_response(self, agent, prompt, **kwargs):
+        for c in await self.get_agent_response(agent, prompt, **kwargs):
+            yield c
+
+
+class RecordingManager:
+    def __init__(self):
+        self.messages = []
+
+    async def send_personal_message(self, message, websocket):
+        self.messages.append(json.loads(message))
+
+
+class PalAITest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(
+            os.path.join(os.path.dirname(__file__), "../../prompts.yaml"), "r"
+        ) as file:
+            cls.prompts_file = yaml.safe_load(file)
+
+    def test_streamed_layers_are_sent_individually(self):
+        config = get_settings().with_overrides(
+            {"socket": {"stream_layers": "true", "layer": "true"}}
+        )
+        pal = PalAI(self.prompts_file, StreamingClient(self.prompts_file), config=config)
+        manager = RecordingManager()
+
+        asyncio.run(
+            pal.build(
+                "a house",
+                ws=object(),
+                manager=manager,
+                request_type=PalAI.PalAIRequest.layers_only(),
+            )
+        )
+
+        layer_events = [m for m in manager.messages if m.get("event") == "layer"]
+        self.assertEqual(len(layer_events), len(pal.plan_list))
+        self.assertEqual(sum(len(m["value"]) for m in layer_events), len(pal.building))
+        for y, m in enumerate(layer_events):
+            self.assertTrue(all(b["position"].split(",")[1] == str(y) for b in m["value"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+
+from PalAI.Server.placeable import Placeable
+
+
+class PlaceableTest(unittest.TestCase):
+    def test_position_follows_coordinates(self):
+        block = Placeable("CUBE", 0, 1, 2)
+        self.assertEqual(block.position, "(0,1,2)")
+        self.assertIs(block.position, block.position)
+
+        block.x += 1
+        self.assertEqual(block.position, "(1,1,2)")
+        block["position"] = "(3,4,5)"
+        self.assertEqual(block.to_json()["position"], "(3,4,5)")
+
+    def test_no_instance_dict(self):
+        self.assertFalse(hasattr(Placeable("CUBE", 0, 0, 0), "__dict__"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,55 @@
 import json
 import random
 import unittest
+from collections import deque
+import numpy as np
 from PalAI.Server.placeable import Placeable
 from PalAI.Server.post_process import PostProcess
+from PalAI.Tests import kernel_reference
+
+
+def _reference_fill_empty_spaces(pixel_grid):
+    """Breadth first search that PostProcess.fill_empty_spaces used to run, each empty space
+    not connected to the outside gets a cube in the grid space the search started from
+
+    :param pixel_grid: grid indexed (y, x, z), 1 for blocks and -1 for empty spaces
+    :type pixel_grid: np.ndarray
+    :return: filled copy of the grid
+    :rtype: np.ndarray
+    """
+    filled = np.copy(pixel_grid)
+    building_array = np.pad(
+        pixel_grid, ((0, 1), (1, 1), (1, 1)), mode="constant", constant_values=-1
+    )
+    y_dim, x_dim, z_dim = building_array.shape
+    visited = np.zeros_like(building_array, dtype=bool)
+
+    label = 0
+    for k in range(y_dim):
+        for i in range(x_dim):
+            for j in range(z_dim):
+                if visited[k, i, j] or building_array[k, i, j] != -1:
+                    continue
+                # The first region found starts in the padding, it is the outside
+                label += 1
+                if label > 1:
+                    filled[k, i - 1, j - 1] = 1
+                queue = deque([(k, i, j)])
+                visited[k, i, j] = True
+                while queue:
+                    y, x, z = queue.popleft()
+                    for dy, dx, dz in ((0, 0, 1), (0, 0, -1), (0, 1, 0), (0, -1, 0), (1, 0, 0), (-1, 0, 0)):
+                        ny, nx, nz = y + dy, x + dx, z + dz
+                        if (
+                            0 <= ny < y_dim
+                            and 0 <= nx < x_dim
+                            and 0 <= nz < z_dim
+                            and not visited[ny, nx, nz]
+                            and building_array[ny, nx, nz] == -1
+                        ):
+                            visited[ny, nx, nz] = True
+                            queue.append((ny, nx, nz))
+    return filled
 
 
 class PostProcessTest(unittest.TestCase):
@@ -34,6 +81,34 @@ class PostProcessTest(unittest.TestCase):
         building = pp.export_building()
         self.assertEqual(len(building), 1)
 
+    def test_removes_floating_cluster(self):
+        building = self._get_square_building(3)
+        building.append(Placeable("CUBE", 1, 1, 1))
+        for x in range(3):
+            building.append(Placeable("CUBE", x, 3, 0))
+            building.append(Placeable("CUBE", x, 4, 0))
+
+        pp = PostProcess()
+        pp.import_building(building)
+        pp.remove_floating_blocks()
+        building = pp.export_building()
+        self.assertEqual(len(building), 10)
+        self.assertTrue(all(p.y <= 1 for p in building))
+
+    def test_keeps_winding_structure(self):
+        # Spiral ramp, each layer only touches the layer below through one block
+        steps = [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2), (1, 2), (0, 2), (0, 1)] * 4
+        building = []
+        for y, (x, z) in enumerate(steps[:-1]):
+            building.append(Placeable("CUBE", x, y, z))
+            building.append(Placeable("CUBE", steps[y + 1][0], y, steps[y + 1][1]))
+        building.append(Placeable("CUBE", 1, 40, 1))
+
+        pp = PostProcess()
+        pp.import_building(building)
+        pp.remove_floating_blocks()
+        self.assertEqual(len(pp.export_building()), 62)
+
     def test_does_not_remove_entire_building(self):
         building = [
             Placeable(
@@ -191,6 +266,57 @@ class PostProcessTest(unittest.TestCase):
 
 
 
+    def test_fill_enclosed_region(self):
+        building = []
+        for x in range(4):
+            for z in range(3):
+                building.append(Placeable("CUBE", x, 0, z))
+                building.append(Placeable("CUBE", x, 2, z))
+                if z != 1 or x not in (1, 2):
+                    building.append(Placeable("CUBE", x, 1, z))
+
+        pp = PostProcess()
+        pp.import_building(building)
+        pp.fill_empty_spaces()
+        building = pp.export_building()
+
+        # Only the first cell of the hole is filled in
+        self.assertEqual(len(building), 35)
+        self.assertEqual(pp.pixel_grid[1, 1, 1], 1)
+        self.assertEqual(pp.pixel_grid[1, 2, 1], -1)
+
+    def test_fill_long_corridor(self):
+        # Closed corridor running along the whole building
+        building = []
+        for x in range(40):
+            for y in range(3):
+                for z in range(3):
+                    if (y, z) != (1, 1) or x in (0, 39):
+                        building.append(Placeable("CUBE", x, y, z))
+
+        pp = PostProcess()
+        pp.import_building(building)
+        pp.fill_empty_spaces()
+        self.assertEqual(len(pp.export_building()), 40 * 9 - 37)
+        self.assertEqual(pp.pixel_grid[1, 1, 1], 1)
+
+    def test_fill_matches_reference(self):
+        pp = PostProcess()
+        rng = random.Random(0)
+        for shape in [(1, 1, 1), (2, 4, 3), (4, 6, 5), (6, 8, 8), (3, 12, 2)]:
+            for density in [0.5, 0.7, 0.9]:
+                pixel_grid = np.array(
+                    [1 if rng.random() < density else -1 for _ in range(np.prod(shape))]
+                ).reshape(shape)
+                pp.pixel_grid = np.copy(pixel_grid)
+                pp.grid = np.full(shape, None, dtype=object)
+                pp.building_grid = None
+                pp.offset_x = pp.offset_y = pp.offset_z = 0
+                pp.fill_empty_spaces()
+                self.assertTrue(
+                    np.array_equal(pp.pixel_grid, _reference_fill_empty_spaces(pixel_grid))
+                )
+
     def test_rounded_style(self):
         pp = PostProcess()
         seen_block_types = set()
@@ -249,5 +375,23 @@ class PostProcessTest(unittest.TestCase):
         if len(seen_rotations) != 4:
             self.fail("Not all rotations were used")
 
+    def test_kernel_matches_reference(self):
+        pp = PostProcess()
+        rng = random.Random(0)
+        for shape in [(1, 1, 1), (1, 5, 3), (4, 6, 5), (6, 8, 8)]:
+            for density in [0.2, 0.5, 0.8]:
+                pp.pixel_grid = np.array(
+                    [1 if rng.random() < density else -1 for _ in range(np.prod(shape))]
+                ).reshape(shape)
+                pp.size_y, pp.size_x, pp.size_z = shape
+                for f in kernel_reference.get_filters():
+                    self.assertEqual(
+                        pp.apply_kernel(f), kernel_reference.apply_kernel(pp.pixel_grid, f)
+                    )
+
+    def test_style_sheet_is_shared(self):
+        self.assertIs(PostProcess().style_sheet, PostProcess().style_sheet)
+        self.assertRaises(ValueError, PostProcess().style_sheet.get_style, "missing")
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from PalAI.Server.LLMClients.response_cache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_normalized_prompts_share_a_key(self):
+        a = ResponseCache.make_key("architect", "system", "I want a  tiny house", "gpt")
+        b = ResponseCache.make_key("architect", "system", " i want a tiny HOUSE", "gpt")
+        c = ResponseCache.make_key("artist", "system", "I want a tiny house", "gpt")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_stores_responses(self):
+        cache = ResponseCache(self.path)
+        self.assertIsNone(cache.get("key"))
+        cache.set("key", "Layer 0: 5x5 Square")
+        self.assertEqual(cache.get("key"), "Layer 0: 5x5 Square")
+
+        # Shared with other connections to the same file
+        self.assertEqual(ResponseCache(self.path).get("key"), "Layer 0: 5x5 Square")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_expired_responses_are_ignored(self):
+        cache = ResponseCache(self.path, ttl=-1)
+        cache.set("key", "response")
+        self.assertIsNone(cache.get("key"))
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(self.path, max_entries=2, evict_interval=1)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+
+    def test_evicts_every_interval(self):
+        cache = ResponseCache(self.path, max_entries=1, evict_interval=3)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        self.assertEqual(len(cache), 2)
+        cache.set("c", "3")
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get("c"), "3")
+
+    def test_can_be_used_from_threads(self):
+        cache = ResponseCache(self.path)
+        asyncio.run(asyncio.to_thread(cache.set, "key", "response"))
+        self.assertEqual(asyncio.run(asyncio.to_thread(cache.get, "key")), "response")
+
+
+if __name__ == "__main__":
+    unittest.main()
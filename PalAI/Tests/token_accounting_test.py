@@ -0,0 +1,44 @@
+import sys
+import unittest
+from unittest import mock
+
+from PalAI.Server.LLMClients import token_accounting
+from PalAI.Server.LLMClients.token_accounting import TokenAccounting
+
+
+class TokenAccountingTest(unittest.TestCase):
+    def test_totals_per_agent(self):
+        usage = TokenAccounting()
+        usage.record("architect", "gpt", 100, 20, 0.001)
+        usage.record("architect", "gpt", 50, 10, 0.001)
+        usage.record("bricklayer", "gpt", 30, 5, 0.001)
+
+        agents = usage.agent_totals()
+        self.assertEqual(agents["architect"]["requests"], 2)
+        self.assertEqual(agents["architect"]["prompt_tokens"], 150)
+        self.assertEqual(agents["bricklayer"]["completion_tokens"], 5)
+        self.assertAlmostEqual(usage.totals()["cost"], 0.215)
+
+    def test_history_is_bounded(self):
+        usage = TokenAccounting(max_requests=10)
+        for i in range(1000):
+            usage.record("architect", "gpt", i, 1, 0.0)
+
+        self.assertEqual(len(usage.recent), 10)
+        self.assertEqual(usage.recent[0].prompt_tokens, 990)
+        self.assertEqual(usage.totals()["requests"], 1000)
+
+    def test_encoding_is_loaded_once(self):
+        tiktoken = mock.Mock()
+        tiktoken.get_encoding.return_value.encode = lambda text, **kwargs: text.split()
+        token_accounting._get_encoding.cache_clear()
+        self.addCleanup(token_accounting._get_encoding.cache_clear)
+
+        with mock.patch.dict(sys.modules, {"tiktoken": tiktoken}):
+            self.assertTrue(token_accounting.load_encoding())
+            self.assertEqual(token_accounting.count_tokens("a small house"), 3)
+        tiktoken.get_encoding.assert_called_once_with("cl100k_base")
+
+
+if __name__ == "__main__":
+    unittest.main()
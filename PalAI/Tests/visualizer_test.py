@@ -0,0 +1,45 @@
+import unittest
+
+from PalAI.Server.visualizer import ObjMesh, ObjVisualizer
+
+TEMPLATE = """# Triangle
+o Triangle
+v 0.0 0.0 0.0
+v 1.0 0.0 0.0
+vt 0.0 0.0
+v 1.0 1.0 0.0
+vn 0.0 0.0 1.0
+usemtl Material
+f 1/1/1 2/1/1 3/1/1
+f 3//1 2 1
+"""
+
+
+class ObjVisualizerTest(unittest.TestCase):
+    def test_mesh_keeps_template_order(self):
+        mesh = ObjMesh(TEMPLATE)
+        self.assertEqual(mesh.vertices.shape, (3, 3))
+        self.assertEqual([kind for kind, _ in mesh.chunks], ["v", "text", "v", "text", "f"])
+
+    def test_mesh_rotation(self):
+        mesh = ObjMesh(TEMPLATE)
+        # A quarter turn around the center of the block moves (1, 0, 0) to (1, 0, 1)
+        vertices = mesh.transform((2.0, 3.0, 4.0), 1, rotation=1).tolist()
+        self.assertEqual(vertices[1], [3.0, 3.0, 5.0])
+        self.assertEqual(mesh.transform((0.0, 0.0, 0.0), 0.5, rotation=4).tolist()[2], [0.5, 0.5, 0.0])
+
+    def test_vertex_offsets_continue_across_blocks(self):
+        building = [
+            {"type": "CUBE", "position": "(0, 0, 0)"},
+            {"type": "CUBE", "position": "(1, 0, 0)", "rotation": 1},
+        ]
+        obj = ObjVisualizer().generate_obj(building).splitlines()
+        vertices = [line for line in obj if line.startswith("v ")]
+        faces = [line for line in obj if line.startswith("f ")]
+        self.assertEqual(len(vertices), 16)
+        self.assertEqual(faces[0].split()[1], "1/1/1")
+        self.assertEqual(faces[6].split()[1], "9/1/1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import random
+import unittest
+
+from PalAI.Server import window_layer
+from PalAI.Server.placeable import Placeable
+
+
+class WindowLayerTest(unittest.TestCase):
+    def _get_wall(self, length):
+        return [Placeable("CUBE", x, 0, 0) for x in range(length)]
+
+    def _windows(self, building):
+        return sorted((w.x, w.y, w.z) for b in building for w in b.tags)
+
+    def test_symmetric_windows_fill_every_pair(self):
+        building = window_layer.create_windows(
+            self._get_wall(6), ["symmetric"], [1.0], random.Random(0)
+        )
+        # Both faces of every block and both ends of the wall
+        self.assertEqual(len(self._windows(building)), 14)
+        self.assertEqual(len(set(self._windows(building))), 14)
+
+    def test_symmetric_windows_are_deterministic(self):
+        building = [Placeable("CUBE", x, 0, z) for x in range(8) for z in range(5)]
+        results = []
+        for _ in range(2):
+            blocks = window_layer.create_windows(
+                [Placeable(b.block_type, b.x, b.y, b.z) for b in building],
+                ["symmetric"],
+                [0.5],
+                random.Random(3),
+            )
+            results.append(self._windows(blocks))
+        self.assertEqual(results[0], results[1])
+        self.assertGreater(len(results[0]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from PalAI.Server.post_process import PostProcess
+from PalAI.Tests import kernel_reference
+
+
+def random_pixel_grid(size, rng, density=0.5):
+    """Creates a cubic grid filled with blocks at random
+
+    :param size: length of each side of the grid
+    :type size: int
+    :param density: chance of each cell containing a block
+    :type density: float
+    :return: grid indexed (y, x, z), 1 for blocks and -1 for empty spaces
+    :rtype: np.ndarray
+    """
+    grid = np.array([1 if rng.random() < density else -1 for _ in range(size**3)])
+    return grid.reshape((size, size, size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks PostProcess.apply_kernel")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[8, 16, 32, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    filters = kernel_reference.get_filters()
+    pp = PostProcess()
+
+    for size in args.sizes:
+        pp.pixel_grid = random_pixel_grid(size, rng)
+        pp.size_y, pp.size_x, pp.size_z = pp.pixel_grid.shape
+
+        start_time = time.time()
+        legacy = [kernel_reference.apply_kernel(pp.pixel_grid, f) for f in filters]
+        legacy_time = time.time() - start_time
+
+        start_time = time.time()
+        vectorized = [pp.apply_kernel(f) for f in filters]
+        vectorized_time = time.time() - start_time
+
+        if legacy != vectorized:
+            raise AssertionError(f"Results differ on a grid of size {size}")
+
+        print(
+            f"{size}^3: legacy {legacy_time:.4f}s | vectorized {vectorized_time:.4f}s"
+            f" | speedup {legacy_time / max(vectorized_time, 1e-9):.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -189,8 +189,7 @@ def runttest(prompt, model_type):
     print("Model used: " + pal_ai.llm_client.model_name)
     try:
         if pal_ai:
-            total_prompt = pal_ai.llm_client.getTotalPromptsUsed()
-            tokens_used = num_tokens_from_string(total_prompt, 'cl100k_base')
+            tokens_used = pal_ai.llm_client.getTotalTokensUsed()
             print("Tokens used: " + str(tokens_used))
             price_rate = pal_ai.llm_client.price_rate
             print("Estimated cost: " + str(round(price_rate * tokens_used, 6)) + "$")
@@ -252,8 +251,7 @@ async def testbricklayer(model_type, model_name=None):
                 new_layer = pal_ai.extract_building_information(response, 0)
                 print("Prompt: " + prompt + "\nGenerated Layer: " + str(new_layer))
                 accuracy, precision, overall_score = evaluate(prompt, new_layer, "bricklayer_baselines")
-                total_prompt = pal_ai.llm_client.getTotalPromptsUsed()
-                tokens_used = num_tokens_from_string(total_prompt, 'cl100k_base')
+                tokens_used = pal_ai.llm_client.getTotalTokensUsed()
                 print("Tokens used: " + str(tokens_used))
                 price_rate = pal_ai.llm_client.price_rate
                 price_total += round(price_rate * tokens_used, 4)
@@ -4,7 +4,6 @@ import os
 import sys
 import traceback
 import uuid
-from configparser import RawConfigParser
 from contextlib import asynccontextmanager
 
 import sentry_sdk
@@ -13,8 +12,11 @@ from fastapi import APIRouter, FastAPI, Response, WebSocket, WebSocketDisconnect
 from loguru import logger
 from sentry_sdk.integrations.loguru import LoggingLevels, LoguruIntegration
 
-from PalAI.Server.LLMClients import gpt_client
+from PalAI.Server import fuzzy_matcher
+from PalAI.Server.LLMClients import gpt_client, token_accounting
+from PalAI.Server.layer_catalog import get_layer_catalog, get_windows
 from PalAI.Server.pal_ai import PalAI
+from PalAI.Server.settings import ROOT_DIR, get_settings
 from PalAI.Server.utils import log_additional_data
 from PalAI.Tools.LLMClients import mock_client, random_client
 
@@ -22,9 +24,8 @@ from PalAI.Tools.LLMClients import mock_client, random_client
 UPLOAD_FOLDER = "Server/Uploads"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-config_path = os.getenv("CONFIG_PATH", "config.ini")
-config = RawConfigParser()
-config.read(os.path.join(os.path.dirname(__file__), config_path))
+# Parsed once before gunicorn forks, shared by every request of every worker
+config = get_settings()
 
 router = APIRouter()
 
@@ -79,14 +80,18 @@ if dsn is not None:
         pass
 
 
-logger.info("Using config file: " + config_path)
+logger.info("Using config file: " + config.config_path)
 PORT = config.getint("server", "port")
 
 use_tokens = config.getboolean("server", "use_tokens")
 
-with open(os.path.join(os.path.dirname(__file__), "prompts.yaml"), "r") as file:
+with open(os.path.join(ROOT_DIR, "prompts.yaml"), "r") as file:
     prompts_file = yaml.safe_load(file)
 
+# Load shared data before gunicorn forks (--preload), so workers share the memory
+get_layer_catalog()
+get_windows()
+
 
 match config.get("llm", "type", fallback="gpt"):
     case "random":
@@ -108,6 +113,16 @@ def test_connect(response: Response):
     return "200 - ok"
 
 
+@router.get("/usage")
+def usage():
+    """Token usage and cost of this worker's LLM client, and how often LLM output needed fuzzy matching"""
+    return {
+        "pid": os.getpid(),
+        **llm_client.usage.stats(),
+        "fuzzy_matching": fuzzy_matcher.total_stats(),
+    }
+
+
 async def stop():
     loop = asyncio.get_event_loop()
     loop.stop()
@@ -158,6 +173,7 @@ async def build(ws: WebSocket):
                         await manager.send_personal_message(json.dumps(result), ws)
 
                         logger.info(f"Request {id}: success")
+                        logger.info(f"Token usage: {llm_client.usage.totals()}")
                     except Exception as e:
                         logger.error(f"Error processing request {id}: {e}")
                         traceback.print_exc()
@@ -203,6 +219,8 @@ manager = ConnectionManager()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # The tokenizer may have to be downloaded, which must not happen inside a request
+    token_accounting.load_encoding()
     # logger.info("Starting up...")
     # logger.info("Started up")
     # app.state.pal = create_pal_instance()